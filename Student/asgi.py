@@ -3,6 +3,24 @@ ASGI config for Student project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Under ASGI the project uses Student/settings_asgi.py, which routes the hot views
+(profile, purchase, std_view, the course request queue and approve) to their async
+versions (student_management/async_views.py, admin_panel/async_views.py). While one of
+them waits on PostgreSQL, the worker's event loop keeps serving other requests.
+
+Deployment (pick one):
+
+    uvicorn Student.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+    gunicorn Student.asgi:application -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8000
+
+Emails are never sent inside a request (they go to the outbox), run the sender next to it:
+
+    python manage.py send_outbox
+
+Comparing with the WSGI path (gunicorn Student.wsgi:application -w 4):
+    python manage.py compare_wsgi_asgi            in-process, same database
+    or point a load tool (wrk, hey) at both servers with a logged in session cookie.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -11,6 +29,6 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Student.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Student.settings_asgi')
 
 application = get_asgi_application()
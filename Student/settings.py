@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,7 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'student_management.middleware.MetricsMiddleware',  # first: times the whole stack, see metrics.py
     'django.middleware.security.SecurityMiddleware',
+    'student_management.middleware.StaticFilesMiddleware',  # /static/ answered here, see static_assets.py
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -50,15 +53,17 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'student_management.middleware.BlockAccessMiddleware',#my middleware to avoid admin to studnet side
+    'student_management.middleware.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'Student.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render time recorded for the request metrics
+        'BACKEND': 'student_management.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
+        'APP_DIRS': DEBUG,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
@@ -69,8 +74,22 @@ TEMPLATES = [
     },
 ]
 
+if not DEBUG:
+    # production: every template is read and compiled once per process
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'Student.wsgi.application'
 
+# Per-view metrics (student_management/metrics.py), Prometheus text at /adm/metrics/.
+# Each worker writes its numbers to METRICS_DIR, empty it when the server starts.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')  # default: <tmp>/student_metrics
+METRICS_FLUSH_SECONDS = 5
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -86,6 +105,49 @@ DATABASES = {
     }
 }
 
+# Connection reuse, picked with the DB_CONNECTIONS environment variable:
+#   pool       psycopg 3 connection pool per worker process (needs psycopg[pool]),
+#              sizes / wait timeout from DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT;
+#              stats per worker at /adm/pool-stats/
+#   persistent one connection per worker thread kept DB_CONN_MAX_AGE seconds, checked before reuse
+#   none       new connection for every request (old behaviour)
+# size the pool so workers x DB_POOL_MAX_SIZE stays under postgres max_connections
+DB_CONNECTIONS = os.environ.get('DB_CONNECTIONS', 'persistent')
+if DB_CONNECTIONS == 'pool':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),  # seconds to wait for a free connection
+        },
+    }
+elif DB_CONNECTIONS == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Read replicas, see student_management/replicas.py. DB_REPLICA_HOSTS is a comma separated
+# list (host or host:port), each one becomes a `replica_N` alias with the primary's
+# credentials; DB_REPLICA_NAME points them at another database name, e.g. a second local
+# database for testing. Only views marked @replica_reads use them.
+DB_REPLICA_HOSTS = [host.strip() for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+REPLICA_DATABASES = []
+for _number, _host in enumerate(DB_REPLICA_HOSTS, start=1):
+    _host, _, _port = _host.partition(':')
+    _alias = f'replica_{_number}'
+    DATABASES[_alias] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': _host,
+        'PORT': _port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},  # tests see one database through both aliases
+    }
+    REPLICA_DATABASES.append(_alias)
+
+DATABASE_ROUTERS = ['student_management.replicas.ReplicaRouter']
+REPLICA_MAX_LAG_SECONDS = 2     # a replica further behind than this is skipped
+REPLICA_LAG_CHECK_SECONDS = 5   # how often each process re-measures the lag
+REPLICA_PIN_SECONDS = 10        # reads stay on the primary this long after a POST
+
 
 
 # Password validation
@@ -124,6 +186,24 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# `manage.py collectstatic` output: content hashed names + .gz (and .br with brotli installed)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'student_management.static_assets.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# the app serves STATIC_ROOT itself when DEBUG is off (StaticFilesMiddleware); set False
+# when nginx / a CDN serves /static/
+SERVE_STATIC = True
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # seconds, hashed names never change content
+STATIC_MAX_AGE = 60  # seconds, files without a hash in the name
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -131,10 +211,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'student_management.CustomUser' #tell django which model to authenticate, control db to where users to store
 
+# request.user comes from the cache (student_management/auth_backends.py),
+# ModelBackend stays listed so sessions created before the switch keep working
+AUTHENTICATION_BACKENDS = [
+    'student_management.auth_backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+AUTH_USER_CACHE_TIMEOUT = 300  # seconds
+
+# sessions read from the cache, written through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# how media_view hands a file over (student_management/media.py): nginx internal location
+# prefix for X-Accel-Redirect, or X-Sendfile (Apache / lighttpd); neither -> FileResponse
+MEDIA_ACCEL_REDIRECT = ''
+MEDIA_X_SENDFILE = False
+MEDIA_MAX_AGE = 3600  # seconds browsers keep a picture (private, access checked)
+
+# profile pictures (student_management/images.py)
+PROFILE_PICTURE_MAX_SIZE = 1024        # px, long side of the stored original
+PROFILE_THUMBNAIL_SIZES = (100, 150)   # square thumbnails made on upload (process_profile_pictures adds new sizes)
+PROFILE_THUMBNAIL_FORMAT = 'WEBP'      # falls back to JPEG if Pillow has no webp
+
+# seconds BlockAccessMiddleware trusts the role cached in the session before re-reading the user
+ROLE_CLAIM_MAX_AGE = 300
+
 LOGIN_URL = 'login' #to change default login url
 
 # email configuration
@@ -145,3 +250,39 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'your@mail'
 EMAIL_HOST_PASSWORD = 'Yourpassword'   
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# email outbox (views queue, `manage.py send_outbox` delivers)
+# for local testing run: manage.py send_outbox --once --backend django.core.mail.backends.console.EmailBackend
+# or django.core.mail.backends.filebased.EmailBackend together with EMAIL_FILE_PATH
+OUTBOX_MAX_ATTEMPTS = 5           # then the email is marked dead
+OUTBOX_RETRY_BASE_SECONDS = 30    # backoff 30s, 60s, 120s ...
+OUTBOX_RETRY_MAX_SECONDS = 3600
+OUTBOX_LEASE_SECONDS = 600        # a claimed batch is retried by another worker after this, keep it above a batch's send time
+
+# admin student list switches to keyset (cursor) pagination above this many (estimated) rows
+STUDENT_LIST_CURSOR_THRESHOLD = 10000
+
+# search backend for the admin student list, None = pick by database (see admin_panel/search.py)
+STUDENT_SEARCH_BACKEND = None
+
+# roll numbers each worker process reserves at a time (see student_management/roll_numbers.py)
+ROLL_NUMBER_BLOCK_SIZE = 20
+
+# Cache
+# local memory is per process; point this at redis/memcached in production so all workers
+# share the profile and reference data caches, e.g.
+# {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'}}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# seconds cached departments / courses live (they are also reloaded on every change)
+REFERENCE_DATA_TIMEOUT = 3600
+
+# seconds a user's cached profile data lives (it is also dropped on every change)
+PROFILE_CACHE_TIMEOUT = 300
+
+# seconds a rendered row of the admin student list lives (the key changes with the row)
+STUDENT_ROW_CACHE_TIMEOUT = 600
@@ -0,0 +1,11 @@
+"""
+Settings for the ASGI deployment (Student/asgi.py): same as settings.py, with the async views.
+"""
+from .settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = 'Student.urls_async'
+
+# persistent connections are per thread and async views hop threads: keep them closed
+# after each request under ASGI. To reuse connections here use DB_CONNECTIONS=pool.
+for _database in DATABASES.values():
+    _database['CONN_MAX_AGE'] = 0
@@ -17,13 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path,include
 from django.conf import settings
-from django.conf.urls.static import static
+from student_management.views import media_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('',include('student_management.urls')),
     path('adm/',include('admin_panel.urls')),
+    # profile pictures, in production too (access checks + X-Accel-Redirect, see student_management/media.py)
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', media_view, name='media'),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,19 @@
+"""
+URL configuration used under ASGI (Student/settings_asgi.py).
+
+The hot views are routed to their async versions; every other URL falls through to the
+normal urlpatterns in Student/urls.py (sync views still work under ASGI, in a thread).
+"""
+from django.urls import path
+
+from admin_panel import async_views as admin_async
+from student_management import async_views as student_async
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('profile/', student_async.profile_view, name='profile'),
+    path('profile/purchase/<int:course_id>/', student_async.purchase_course, name='purchase_course'),
+    path('adm/', admin_async.std_view, name='std_view'),
+    path('adm/course-requests/', admin_async.manage_course_requests, name='manage_course_requests'),
+    path('adm/course-requests/approve/<int:request_id>/', admin_async.approve_request, name='approve_request'),
+] + sync_urlpatterns
@@ -0,0 +1,216 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from student_management.models import AddOnCourse, CoursePurchaseRequest, CustomUser, Department
+from .models import CourseStats, DepartmentStats
+
+
+# Admin analytics: students per department, requests per course and status, revenue.
+#
+# The numbers live in two summary tables (models.py), one row per department / course, so
+# the dashboard reads O(departments + courses) rows whatever the size of the student and
+# request tables. Every change is applied as a delta in the same transaction as the change
+# itself (UPDATE ... SET n = n + 1):
+#   - post_save / post_delete of CustomUser and CoursePurchaseRequest (signals.py), old values
+#     come from the _loaded_values the models keep from from_db()
+#   - purchase_requests_bulk_updated from CoursePurchaseRequest transitions (approve, reject,
+#     complete, bulk_approve, bulk_reject): conditional UPDATEs, no post_save
+#   - add_students() from bulk imports
+# `manage.py rebuild_analytics` recomputes everything with GROUP BY (after seed_scale, or
+# to repair drift; --check only reports it).
+
+STATUSES = [status for status, _ in CoursePurchaseRequest.STATUS_CHOICES]
+PAID_STATUSES = ('approved', 'completed')  # revenue = price x these
+
+
+def student_department(values):
+    """Department a user row counts for, None for staff / no department."""
+    if values is None or values['is_staff'] or values['is_superuser']:
+        return None
+    return values['department_id']
+
+
+def user_values(user):
+    return {name: getattr(user, name) for name in CustomUser.TRACKED_FIELDS}
+
+
+def request_values(purchase_request):
+    return {name: getattr(purchase_request, name) for name in CoursePurchaseRequest.TRACKED_FIELDS}
+
+
+def add_students(deltas):
+    """deltas: {department_id: change}."""
+    for department_id, change in deltas.items():
+        if department_id is None or not change:
+            continue
+        if not DepartmentStats.objects.filter(department_id=department_id).update(students=F('students') + change):
+            # no row: department bulk created, or being deleted right now (its row cascades first)
+            transaction.on_commit(recount_departments)
+
+
+def add_requests(deltas):
+    """deltas: {(course_id, status): change}."""
+    by_course = {}
+    for (course_id, status), change in deltas.items():
+        if change and status in STATUSES:
+            by_course.setdefault(course_id, {})[status] = change
+    for course_id, changes in by_course.items():
+        update = {status: F(status) + change for status, change in changes.items()}
+        if not CourseStats.objects.filter(course_id=course_id).update(**update):
+            transaction.on_commit(lambda course_id=course_id: recount_course(course_id))
+
+
+def user_saved(user, created):
+    old = None if created else getattr(user, '_loaded_values', None)
+    new = user_values(user)
+    user._loaded_values = new
+    if old is None and not created:
+        # saved without being loaded (or with the tracked fields deferred): old state unknown
+        transaction.on_commit(recount_departments)
+        return
+    add_students(delta(student_department(old), student_department(new)))
+
+
+def user_deleted(user):
+    add_students({student_department(getattr(user, '_loaded_values', None) or user_values(user)): -1})
+
+
+def request_key(values):
+    return None if values is None else (values['course_id'], values['status'])
+
+
+def request_saved(purchase_request, created):
+    old = None if created else getattr(purchase_request, '_loaded_values', None)
+    new = request_values(purchase_request)
+    purchase_request._loaded_values = new
+    if old is None and not created:
+        transaction.on_commit(lambda: recount_course(new['course_id']))
+        return
+    add_requests(delta(request_key(old), request_key(new)))
+
+
+def request_deleted(purchase_request):
+    values = getattr(purchase_request, '_loaded_values', None) or request_values(purchase_request)
+    add_requests({(values['course_id'], values['status']): -1})
+
+
+def requests_bulk_updated(rows, old_status, new_status):
+    deltas = Counter()
+    for row in rows:
+        deltas[(row['course_id'], old_status)] -= 1
+        deltas[(row['course_id'], new_status)] += 1
+    add_requests(deltas)
+
+
+def delta(old_key, new_key):
+    if old_key == new_key:
+        return {}
+    changes = {}
+    if old_key is not None:
+        changes[old_key] = -1
+    if new_key is not None:
+        changes[new_key] = changes.get(new_key, 0) + 1
+    return changes
+
+
+# full recomputation
+
+def department_counts():
+    return dict(
+        CustomUser.objects.filter(is_staff=False, is_superuser=False, department__isnull=False)
+        .values_list('department_id').annotate(n=Count('id')).values_list('department_id', 'n')
+    )
+
+
+def course_counts(course_ids=None):
+    rows = CoursePurchaseRequest.objects.all()
+    if course_ids is not None:
+        rows = rows.filter(course_id__in=course_ids)
+    counts = {}
+    for course_id, status, n in rows.values_list('course_id', 'status').annotate(n=Count('id')).values_list(
+            'course_id', 'status', 'n'):
+        counts.setdefault(course_id, dict.fromkeys(STATUSES, 0))[status] = n
+    return counts
+
+
+def recount_departments():
+    with transaction.atomic():
+        counts = department_counts()
+        for department_id in Department.objects.values_list('id', flat=True):
+            DepartmentStats.objects.update_or_create(
+                department_id=department_id, defaults={'students': counts.get(department_id, 0)},
+            )
+
+
+def recount_course(course_id):
+    with transaction.atomic():
+        counts = course_counts([course_id]).get(course_id, dict.fromkeys(STATUSES, 0))
+        if AddOnCourse.objects.filter(id=course_id).exists():
+            CourseStats.objects.update_or_create(course_id=course_id, defaults=counts)
+
+
+def rebuild():
+    """Recompute both summary tables from scratch, returns (departments, courses) rows written."""
+    with transaction.atomic():
+        departments = department_counts()
+        courses = course_counts()
+        DepartmentStats.objects.all().delete()
+        CourseStats.objects.all().delete()
+        department_rows = DepartmentStats.objects.bulk_create([
+            DepartmentStats(department_id=pk, students=departments.get(pk, 0))
+            for pk in Department.objects.values_list('id', flat=True)
+        ])
+        course_rows = CourseStats.objects.bulk_create([
+            CourseStats(course_id=pk, **courses.get(pk, dict.fromkeys(STATUSES, 0)))
+            for pk in AddOnCourse.objects.values_list('id', flat=True)
+        ])
+    return len(department_rows), len(course_rows)
+
+
+def drift():
+    """Differences between the summary tables and a fresh count: [(what, stored, actual)]."""
+    differences = []
+    departments = department_counts()
+    for stats in DepartmentStats.objects.select_related('department'):
+        actual = departments.get(stats.department_id, 0)
+        if stats.students != actual:
+            differences.append((f'department {stats.department}', stats.students, actual))
+    courses = course_counts()
+    for stats in CourseStats.objects.select_related('course'):
+        actual = courses.get(stats.course_id, dict.fromkeys(STATUSES, 0))
+        for status in STATUSES:
+            if getattr(stats, status) != actual[status]:
+                differences.append((f'course {stats.course} {status}', getattr(stats, status), actual[status]))
+    return differences
+
+
+# dashboard
+
+def dashboard_data():
+    """Everything the dashboard shows, from the summary tables only (2 queries)."""
+    departments = [
+        {'name': dept.name, 'students': getattr(getattr(dept, 'stats', None), 'students', 0)}
+        for dept in Department.objects.select_related('stats').order_by('name')
+    ]
+    courses = []
+    totals = dict.fromkeys(STATUSES, 0)
+    revenue = Decimal('0')
+    for course in AddOnCourse.objects.select_related('stats').order_by('course'):
+        stats = getattr(course, 'stats', None)
+        counts = {status: getattr(stats, status, 0) for status in STATUSES}
+        enrolled = sum(counts[status] for status in PAID_STATUSES)
+        course_revenue = course.price * enrolled
+        courses.append({'course': course, 'counts': counts, 'enrolled': enrolled, 'revenue': course_revenue})
+        for status in STATUSES:
+            totals[status] += counts[status]
+        revenue += course_revenue
+    return {
+        'departments': departments,
+        'total_students': sum(dept['students'] for dept in departments),
+        'courses': courses,
+        'status_totals': totals,
+        'revenue': revenue,
+    }
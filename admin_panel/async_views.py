@@ -0,0 +1,95 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
+
+from student_management.conditional import conditional_page
+from student_management.models import CoursePurchaseRequest, CustomUser
+from student_management.reference_data import get_courses
+from student_management.replicas import replica_reads
+from .pagination import KeysetPaginator, estimate_count
+from .search import get_search_backend
+from .views import STUDENT_ROW_PREFETCH, already_handled, approve_purchase, course_queue_stamps, row_cache_context
+
+
+# Async versions of the hot admin views, routed by Student/urls_async.py when served
+# through Student/asgi.py. Same templates and context as views.py.
+# Everything the template needs is fetched before render(): a lazy query inside the
+# template would be a sync ORM call from async code.
+
+@login_required
+@replica_reads
+async def std_view(request):
+    query = request.GET.get('q', '')
+    gender_filter = request.GET.get('gender', '')
+
+    search = get_search_backend()
+    students = CustomUser.objects.order_by('roll_number', 'id')
+    if query:
+        students = await search.afilter(students, query)
+    if gender_filter:
+        students = students.filter(gender=gender_filter)
+    students = students.select_related('department').prefetch_related(*STUDENT_ROW_PREFETCH)
+
+    mode = request.GET.get('mode', '')
+    after = request.GET.get('after', '')
+    before = request.GET.get('before', '')
+    if mode not in ('page', 'cursor'):
+        if after or before:
+            mode = 'cursor'
+        else:
+            estimate = await sync_to_async(estimate_count)(students)  # raw EXPLAIN, no async api
+            threshold = getattr(settings, 'STUDENT_LIST_CURSOR_THRESHOLD', 10000)
+            mode = 'cursor' if estimate is not None and estimate > threshold else 'page'
+
+    if mode == 'cursor':
+        count_mode = request.GET.get('count', 'estimate')
+        if count_mode not in ('exact', 'estimate'):
+            count_mode = None
+        paginator = KeysetPaginator(students, 5, keys=('roll_number', 'id'))
+        page_obj = await sync_to_async(paginator.get_page)(after=after, before=before, count=count_mode)
+    else:
+        if query:
+            students = search.rank(students, query)
+        paginator = Paginator(students, 5)
+        paginator.count = await students.acount()  # so get_page() doesn't count synchronously
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_obj.object_list = [student async for student in page_obj.object_list]
+
+    context = {
+        'students': page_obj,
+        'query': query,
+        'gender_filter': gender_filter,
+        'cursor_mode': mode == 'cursor',
+        **row_cache_context(),
+    }
+    return render(request, 'student_view.html', context)
+
+
+@login_required
+@replica_reads
+@conditional_page(course_queue_stamps)
+async def manage_course_requests(request):
+    requests = [
+        req async for req in
+        CoursePurchaseRequest.objects.filter(status='pending').select_related('student', 'course')
+    ]
+    courses = await sync_to_async(get_courses)()
+    return render(request, 'manage_course.html', {'requests': requests, 'courses': courses})
+
+
+@login_required
+@require_POST
+async def approve_request(request, request_id):
+    purchase_request = await aget_object_or_404(
+        CoursePurchaseRequest.objects.select_related('student', 'course'), id=request_id,
+    )
+    # the ORM has no async transactions: the UPDATE + M2M + outbox insert run in one sync call
+    if await sync_to_async(approve_purchase)(purchase_request):
+        messages.success(request, f'Course "{purchase_request.course.course}" approved for {purchase_request.student.username}.')
+    else:
+        already_handled(request, purchase_request)
+    return redirect('manage_course_requests')
@@ -1,7 +1,13 @@
 from django import forms
 from student_management.models import CustomUser
 from student_management.models import Department
-class FullCustomUserChangeForm(forms.ModelForm):
+from student_management.forms import CachedModelChoiceField, UniqueFieldsMixin
+from student_management.reference_data import get_departments
+class FullCustomUserChangeForm(UniqueFieldsMixin, forms.ModelForm):
+    # department options come from the reference data cache, no query per render
+    department = CachedModelChoiceField(get_departments, queryset=Department.objects.all(),
+                                        widget=forms.Select(attrs={'class': 'form-select'}))
+
     class Meta:
         password = None  # Hide password field
         model = CustomUser
@@ -16,21 +22,12 @@ class FullCustomUserChangeForm(forms.ModelForm):
             'username': forms.TextInput(attrs={'class': 'form-control'}),
             'email': forms.EmailInput(attrs={'class': 'form-control'}),
             'roll_number': forms.NumberInput(attrs={'class': 'form-control'}),
-            'department': forms.Select(attrs={'class': 'form-select'}),
         }
-    def clean_email(self):
-        email = self.cleaned_data.get('email')
-        qs = CustomUser.objects.exclude(pk=self.instance.pk).filter(email=email)
-        if qs.exists():
-            raise forms.ValidationError("This email is already in use by another student.")
-        return email
-
-    # Validation for roll number
-    def clean_roll_number(self):
-        roll_number = self.cleaned_data.get('roll_number')
-        qs = CustomUser.objects.exclude(pk=self.instance.pk).filter(roll_number=roll_number)
-        if qs.exists():
-            raise forms.ValidationError("This roll number is already assigned to another student.")
-        return roll_number
+    # email, roll number (and username) checked in one query, see UniqueFieldsMixin
+    unique_fields = {
+        'username': ('exact', "A user with that username already exists."),
+        'email': ('iexact', "This email is already in use by another student."),
+        'roll_number': ('exact', "This roll number is already assigned to another student."),
+    }
 
 
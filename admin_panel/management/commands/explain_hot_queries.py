@@ -0,0 +1,85 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from admin_panel.views import filter_students
+from student_management.models import AddOnCourse, CoursePurchaseRequest, CustomUser
+
+# Tables that grow with the number of students: a full scan of one of these in a hot
+# query is a regression. Department / AddOnCourse are small, scanning them is fine.
+BIG_TABLES = {
+    CustomUser._meta.db_table,
+    CustomUser.purchased_courses.through._meta.db_table,
+    CoursePurchaseRequest._meta.db_table,
+}
+
+# PostgreSQL: "Seq Scan on <table>"; SQLite: "SCAN <table>" without "USING ... INDEX"
+SEQ_SCAN = re.compile(r'Seq Scan on (?P<pg>\w+)|\bSCAN (?P<lite>\w+)\b(?! USING (?:COVERING )?INDEX)')
+
+
+def hot_queries(student_id, course_id, roll_number):
+    """(name, queryset, tables a scan is expected on) for the main query of each hot view."""
+    search_scan = set() if connection.vendor == 'postgresql' else {CustomUser._meta.db_table}
+    pending = CoursePurchaseRequest.objects.filter(status='pending')
+    return [
+        ('profile: requests', CoursePurchaseRequest.objects.filter(student_id=student_id)
+            .select_related('course').order_by('id'), ()),
+        ('profile: purchased ids', AddOnCourse.objects.filter(students=student_id).values_list('id', flat=True), ()),
+        ('purchase_course: pending check', pending.filter(student_id=student_id, course_id=course_id), ()),
+        ('mark_course_completed', CoursePurchaseRequest.objects.filter(
+            student_id=student_id, course_id=course_id, status='approved'), ()),
+        ('student requests by status', CoursePurchaseRequest.objects.filter(
+            student_id=student_id, status='approved'), ()),
+        ('manage_course_requests', pending.select_related('student', 'course'), ()),
+        ('bulk requests: one course', pending.filter(course_id=course_id), ()),
+        ('std_view: first page', filter_students('', '')[:6], ()),
+        ('std_view: gender', filter_students('', 'Female')[:6], ()),
+        ('std_view: gender, later page', filter_students('', 'Female').filter(roll_number__gt=roll_number)[:6], ()),
+        ('std_view: roll number', filter_students(str(roll_number), ''), ()),
+        ('std_view: text search', filter_students('ab', '')[:6], search_scan),
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Print the query plan of each hot view's main queries and flag full scans of the big "
+            "tables. Run it against a seeded database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE (runs the queries)')
+        parser.add_argument('--no-seqscan', action='store_true',
+                            help='PostgreSQL: SET enable_seqscan = off, shows whether an index can serve '
+                                 'the query even when the table is too small for the planner to use it')
+        parser.add_argument('--fail', action='store_true', help='exit with an error when a scan is flagged')
+
+    def handle(self, *args, **options):
+        sample = CoursePurchaseRequest.objects.values_list('student_id', 'course_id', 'student__roll_number').first()
+        if sample is None:
+            raise CommandError('No purchase requests, seed the database first.')
+
+        explain_options = {}
+        if connection.vendor == 'postgresql':
+            explain_options['analyze'] = options['analyze']
+            if options['no_seqscan']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET enable_seqscan = off')
+
+        flagged = []
+        for name, queryset, scan_ok in hot_queries(*sample):
+            plan = queryset.explain(**explain_options)
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            for match in SEQ_SCAN.finditer(plan):
+                table = match.group('pg') or match.group('lite')
+                if table in BIG_TABLES and table not in scan_ok:
+                    flagged.append((name, table))
+                    self.stdout.write(self.style.WARNING(f'  !! full scan of {table}'))
+            self.stdout.write('')
+
+        if not flagged:
+            self.stdout.write(self.style.SUCCESS('no full scans of big tables'))
+            return
+        summary = ', '.join(f'{name} ({table})' for name, table in flagged)
+        if options['fail']:
+            raise CommandError(f'full scans in: {summary}')
+        self.stdout.write(self.style.WARNING(f'full scans in: {summary}'))
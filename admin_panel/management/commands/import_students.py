@@ -0,0 +1,223 @@
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from student_management.forms import CustomUserCreationForm
+from student_management.models import CustomUser, OutboundEmail
+from student_management.reference_data import get_departments
+from student_management.roll_numbers import allocate_roll_numbers
+from admin_panel.analytics import add_students
+from admin_panel.password_pool import hash_password, password_pool
+
+
+# Bulk student import: manage.py import_students students.csv
+#
+# Columns (csv header or jsonl keys): username, email, password, date_of_birth, age, gender,
+# place, phone, department (department NAME).
+# password may be empty: the student then gets an unusable password and uses "forgot password".
+#
+# Per batch: validate every row with the registration form rules, hash the passwords in a
+# process pool (PBKDF2 is the slow part), take roll numbers in one round trip, bulk_create.
+# Bad rows are written to the error report, good rows are still imported.
+
+FIELDS = ['username', 'email', 'password', 'date_of_birth', 'age', 'gender', 'place', 'phone', 'department']
+
+
+class ImportStudentForm(CustomUserCreationForm):
+    """
+    CustomUserCreationForm rules without its per-row uniqueness queries,
+    the command checks usernames / emails for the whole file at once.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['password1'].required = False
+        self.fields['password2'].required = False
+
+    def clean_username(self):
+        return self.cleaned_data.get('username')
+
+    def validate_unique(self):
+        pass
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, dict) one at a time, the file is never fully loaded."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as exc:
+                yield line_number, {'__error__': f'invalid json: {exc}'}
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = "Import students from a CSV or JSONL file (use - for stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='processes used to hash passwords')
+        parser.add_argument('--errors', help='error report path (default <path>.errors.csv)')
+        parser.add_argument('--welcome-email', action='store_true',
+                            help='queue the welcome email in the outbox for every imported student')
+        parser.add_argument('--dry-run', action='store_true', help='validate only, insert nothing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        errors_path = options['errors'] or ('import_errors.csv' if path == '-' else path + '.errors.csv')
+
+        # one pass over reference data / existing users instead of queries per row
+        self.departments = {dept.name.lower(): dept.pk for dept in get_departments()}
+        self.seen_usernames = set()
+        self.seen_emails = set()
+        for username, email in CustomUser.objects.values_list('username', 'email').iterator(chunk_size=5000):
+            self.seen_usernames.add(username.lower())
+            if email:
+                self.seen_emails.add(email.lower())
+
+        self.options = options
+        self.imported = self.failed = 0
+        started = time.monotonic()
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        pool = password_pool(options['workers'])
+        try:
+            with open(errors_path, 'w', newline='', encoding='utf-8') as error_file:
+                self.error_writer = csv.writer(error_file)
+                self.error_writer.writerow(['line', 'username', 'errors'])
+                for batch in batched(read_rows(stream, fmt), options['batch_size']):
+                    self.import_batch(batch, pool)
+                    self.stdout.write(f'imported {self.imported}, failed {self.failed}')
+        except OSError as exc:
+            raise CommandError(str(exc))
+        finally:
+            pool.shutdown()
+            if stream is not sys.stdin:
+                stream.close()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'done in {elapsed:.1f}s: imported {self.imported}, failed {self.failed} (errors in {errors_path})'
+        ))
+
+    def report(self, line, username, message):
+        self.failed += 1
+        self.error_writer.writerow([line, username, message])
+
+    def validate(self, line, row):
+        """Return an unsaved CustomUser + raw password, or None after reporting the errors."""
+        if '__error__' in row:
+            self.report(line, '', row['__error__'])
+            return None
+        row = {key: (str(row[key]).strip() if row.get(key) is not None else '') for key in FIELDS}
+        department = row['department']
+        department_id = self.departments.get(department.lower())
+        if department and department_id is None:
+            self.report(line, row['username'], f'department: unknown department "{department}"')
+            return None
+
+        data = dict(row, department=department_id or '', password1=row['password'], password2=row['password'])
+        form = ImportStudentForm(data)
+        if not form.is_valid():
+            message = '; '.join(f'{field}: {" ".join(errs)}' for field, errs in form.errors.items())
+            self.report(line, row['username'], message)
+            return None
+
+        username, email = row['username'].lower(), row['email'].lower()
+        if username in self.seen_usernames:
+            self.report(line, row['username'], 'username: already taken')
+            return None
+        if email in self.seen_emails:
+            self.report(line, row['username'], 'email: already in use')
+            return None
+        self.seen_usernames.add(username)
+        self.seen_emails.add(email)
+        return form.instance, row['password']
+
+    def import_batch(self, batch, pool):
+        valid = []
+        for line, row in batch:
+            result = self.validate(line, row)
+            if result is not None:
+                valid.append((line,) + result)
+        if not valid:
+            return
+
+        passwords = [password for _, _, password in valid if password]
+        chunksize = max(1, len(passwords) // (self.options['workers'] * 4))
+        hashes = iter(pool.map(hash_password, passwords, chunksize=chunksize))
+        users = []
+        for line, user, password in valid:
+            if password:
+                user.password = next(hashes)
+            else:
+                user.set_unusable_password()
+            users.append((line, user))
+
+        if self.options['dry_run']:
+            self.imported += len(users)
+            return
+
+        for (line, user), roll_number in zip(users, allocate_roll_numbers(len(users))):
+            user.roll_number = roll_number
+
+        try:
+            with transaction.atomic():
+                created = CustomUser.objects.bulk_create([user for _, user in users])
+                add_students(Counter(user.department_id for user in created))  # no signals from bulk_create
+                self.queue_welcome(created)
+            self.imported += len(created)
+        except IntegrityError:
+            # someone registered one of these names meanwhile: insert one by one to find it
+            for line, user in users:
+                try:
+                    with transaction.atomic():
+                        created = CustomUser.objects.bulk_create([user])
+                        add_students({user.department_id: 1})
+                        self.queue_welcome(created)
+                    self.imported += 1
+                except IntegrityError as exc:
+                    self.report(line, user.username, f'integrity error: {exc}')
+
+    def queue_welcome(self, users):
+        if not self.options['welcome_email']:
+            return
+        OutboundEmail.objects.bulk_create([
+            OutboundEmail(
+                subject="Welcome to ABC College of Arts and Science",
+                body=f"Hi {user.username},\n\nWelcome! Your account has been successfully created.",
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[user.email],
+            )
+            for user in users
+        ])
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_panel.analytics import drift, rebuild
+
+
+class Command(BaseCommand):
+    help = ("Recompute the analytics summary tables (students per department, requests per course "
+            "and status) from scratch. Run it after bulk loads, or with --check to look for drift.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='only compare the tables with a fresh count, exit with an error on drift')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            differences = drift()
+            for what, stored, actual in differences:
+                self.stdout.write(f'{what}: stored {stored}, actual {actual}')
+            if differences:
+                raise CommandError(f'{len(differences)} counters drifted, run rebuild_analytics')
+            self.stdout.write(self.style.SUCCESS('summary tables match the data'))
+            return
+        departments, courses = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'analytics rebuilt: {departments} departments, {courses} courses'))
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_summary(apps, schema_editor):
+    # same counts as analytics.rebuild(), for the rows that exist already
+    alias = schema_editor.connection.alias
+    Department = apps.get_model('student_management', 'Department')
+    AddOnCourse = apps.get_model('student_management', 'AddOnCourse')
+    CustomUser = apps.get_model('student_management', 'CustomUser')
+    CoursePurchaseRequest = apps.get_model('student_management', 'CoursePurchaseRequest')
+    DepartmentStats = apps.get_model('admin_panel', 'DepartmentStats')
+    CourseStats = apps.get_model('admin_panel', 'CourseStats')
+
+    students = dict(
+        CustomUser.objects.using(alias)
+        .filter(is_staff=False, is_superuser=False, department__isnull=False)
+        .values_list('department_id').annotate(n=Count('id')).values_list('department_id', 'n')
+    )
+    DepartmentStats.objects.using(alias).bulk_create([
+        DepartmentStats(department_id=pk, students=students.get(pk, 0))
+        for pk in Department.objects.using(alias).values_list('id', flat=True)
+    ])
+    requests = {}
+    for course_id, status, n in (
+        CoursePurchaseRequest.objects.using(alias).values_list('course_id', 'status')
+        .annotate(n=Count('id')).values_list('course_id', 'status', 'n')
+    ):
+        requests.setdefault(course_id, {})[status] = n
+    CourseStats.objects.using(alias).bulk_create([
+        CourseStats(course_id=pk, **requests.get(pk, {}))
+        for pk in AddOnCourse.objects.using(alias).values_list('id', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('student_management', '0013_email_ci_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pending', models.IntegerField(default=0)),
+                ('approved', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='student_management.addoncourse')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DepartmentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('students', models.IntegerField(default=0)),
+                ('department', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='student_management.department')),
+            ],
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
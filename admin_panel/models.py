@@ -1,4 +1,27 @@
 from django.db import models
 
-# Create your models here.
+from student_management.models import AddOnCourse, Department
 
+
+# Summary tables behind the analytics dashboard (analytics.py). Kept up to date by the
+# signals in signals.py, recomputed from scratch by `manage.py rebuild_analytics`.
+
+class DepartmentStats(models.Model):
+    department = models.OneToOneField(Department, on_delete=models.CASCADE, related_name='stats')
+    students = models.IntegerField(default=0)  # non staff users in the department
+
+    def __str__(self):
+        return f'{self.department}: {self.students} students'
+
+
+class CourseStats(models.Model):
+    # one counter per CoursePurchaseRequest status (IntegerField: a drifted counter may dip below 0
+    # until the next rebuild rather than fail the write)
+    course = models.OneToOneField(AddOnCourse, on_delete=models.CASCADE, related_name='stats')
+    pending = models.IntegerField(default=0)
+    approved = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.course} stats'
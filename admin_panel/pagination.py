@@ -0,0 +1,134 @@
+import base64
+import json
+
+from django.db import connections
+from django.db.models import Q
+
+
+# Keyset (cursor) pagination for big lists.
+# Page-number pagination needs COUNT(*) + OFFSET, which gets slower the deeper you go.
+# Here every page is "WHERE (roll_number, id) > last seen ORDER BY roll_number, id LIMIT n",
+# so page 1 and page 10000 cost the same (index on roll_number does the work).
+
+def encode_cursor(values):
+    raw = json.dumps(list(values)).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    # bad / tampered cursor -> None, the view just starts from the first page
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return [int(v) for v in values]
+    except (ValueError, TypeError):
+        return None
+
+
+def estimate_count(queryset):
+    """Row estimate from the PostgreSQL planner (no table scan). None on other databases."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CursorPage:
+    """One page of a keyset paginated queryset, iterable like a normal Page."""
+
+    def __init__(self, object_list, has_next, has_previous, keys, count=None, count_is_exact=False):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.keys = keys
+        self.count = count
+        self.count_is_exact = count_is_exact  # COUNT(*), not the planner estimate
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def _cursor_for(self, obj):
+        return encode_cursor(getattr(obj, key) for key in self.keys)
+
+    @property
+    def next_cursor(self):
+        if self.has_next_page and self.object_list:
+            return self._cursor_for(self.object_list[-1])
+        return ''
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous_page and self.object_list:
+            return self._cursor_for(self.object_list[0])
+        return ''
+
+
+class KeysetPaginator:
+    """
+    Paginates on a unique, ordered pair of columns, e.g. ('roll_number', 'id').
+    The second key only breaks ties so the order is always total.
+    """
+
+    def __init__(self, queryset, per_page, keys=('roll_number', 'id')):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keys = keys
+
+    def _after(self, values):
+        first, second = self.keys
+        return Q(**{f'{first}__gt': values[0]}) | Q(**{first: values[0], f'{second}__gt': values[1]})
+
+    def _before(self, values):
+        first, second = self.keys
+        return Q(**{f'{first}__lt': values[0]}) | Q(**{first: values[0], f'{second}__lt': values[1]})
+
+    def get_page(self, after=None, before=None, count=None):
+        """
+        after / before are encoded cursors from a previous page.
+        count: None to skip counting, 'estimate' for the planner estimate, 'exact' for COUNT(*).
+        """
+        after_values = decode_cursor(after)
+        before_values = decode_cursor(before)
+        limit = self.per_page + 1  # fetch one extra row to know if there is another page
+
+        if before_values and len(before_values) == len(self.keys):
+            ordering = ['-' + key for key in self.keys]
+            rows = list(self.queryset.filter(self._before(before_values)).order_by(*ordering)[:limit])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            has_next = True
+        else:
+            qs = self.queryset
+            has_previous = False
+            if after_values and len(after_values) == len(self.keys):
+                qs = qs.filter(self._after(after_values))
+                has_previous = True
+            rows = list(qs.order_by(*self.keys)[:limit])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+
+        total = None
+        if count == 'exact':
+            total = self.queryset.count()
+        elif count == 'estimate':
+            total = estimate_count(self.queryset)
+
+        return CursorPage(rows, has_next, has_previous, self.keys, total, count_is_exact=count == 'exact')
@@ -0,0 +1,27 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Process pool for password hashing in bulk imports (PBKDF2 is CPU bound, one core per worker).
+# Kept free of model imports: spawned workers import this module before Django is set up.
+
+def init_worker(settings_module):
+    # spawned worker: fresh interpreter, no inherited database connections
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def hash_password(password):
+    from django.contrib.auth.hashers import make_password
+    return make_password(password)
+
+
+def password_pool(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'Student.settings'),),
+    )
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connections
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.utils.module_loading import import_string
+
+from student_management.models import Department
+
+
+# Search backends for the admin student list (std_view ?q=...).
+# The old search was 4 icontains ORed together, one of them over a JOIN to department
+# and one on roll_number cast to text, so no index could ever be used.
+#
+# Every backend does the same three things:
+#   1. full email  -> exact, case-insensitive email match
+#   2. anything else -> substring match on username / email, plus department ids
+#      looked up first from the small Department table (so no JOIN in the big query)
+#   3. numeric q   -> also an exact roll_number match (unique index), ranked first;
+#      usernames can be all digits too, so it adds to the text match instead of replacing it
+# The PostgreSQL backend ranks with pg_trgm similarity, the indexes live in
+# student_management/migrations/0009_search_trigram_indexes.py.
+
+
+class BasicSearchBackend:
+    """Works on every database (SQLite in tests), ranks with a simple CASE."""
+
+    def filter(self, queryset, query):
+        query = query.strip()
+        if not query:
+            return queryset
+        if self.is_email(query):
+            return queryset.filter(email__iexact=query)
+        return queryset.filter(self.text_condition(query))
+
+    async def afilter(self, queryset, query):
+        """filter() for async views, the department lookup goes through the async ORM."""
+        query = query.strip()
+        if not query or self.is_email(query):
+            return self.filter(queryset, query)  # no query runs for these
+        department_ids = [
+            pk async for pk in Department.objects.filter(name__icontains=query).values_list('id', flat=True)
+        ]
+        return queryset.filter(self.text_condition(query, department_ids))
+
+    def text_condition(self, query, department_ids=None):
+        if department_ids is None:
+            department_ids = list(
+                Department.objects.filter(name__icontains=query).values_list('id', flat=True)
+            )
+        condition = Q(username__icontains=query) | Q(email__icontains=query)
+        if department_ids:
+            condition |= Q(department_id__in=department_ids)
+        if query.isdigit():
+            condition |= Q(roll_number=int(query))
+        return condition
+
+    def rank(self, queryset, query):
+        """Order the filtered queryset best match first (ties keep roll number order)."""
+        query = query.strip()
+        if not query or self.is_email(query):
+            return queryset  # exact match, nothing to rank
+        whens = [
+            When(username__iexact=query, then=Value(3)),
+            When(username__istartswith=query, then=Value(2)),
+            When(Q(username__icontains=query) | Q(email__icontains=query), then=Value(1)),
+        ]
+        if query.isdigit():
+            whens.insert(0, When(roll_number=int(query), then=Value(4)))
+        search_rank = Case(*whens, default=Value(0), output_field=IntegerField())
+        return queryset.annotate(search_rank=search_rank).order_by('-search_rank', 'roll_number', 'id')
+
+    @staticmethod
+    def is_email(query):
+        if '@' not in query:
+            return False
+        try:
+            validate_email(query)
+        except ValidationError:
+            return False
+        return True
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    """
+    Same filters, served by the pg_trgm GIN indexes on UPPER(username) / UPPER(email)
+    (that is the expression Django's icontains produces), ranked by trigram similarity.
+    """
+
+    def rank(self, queryset, query):
+        from django.contrib.postgres.search import TrigramSimilarity
+        from django.db.models.functions import Greatest
+
+        query = query.strip()
+        if not query or self.is_email(query):
+            return queryset
+        search_rank = Greatest(
+            TrigramSimilarity('username', query),
+            TrigramSimilarity('email', query),
+        )
+        if query.isdigit():  # similarity is at most 1, the roll number match goes above it
+            search_rank = Case(
+                When(roll_number=int(query), then=Value(2.0)),
+                default=search_rank,
+                output_field=FloatField(),
+            )
+        return queryset.annotate(search_rank=search_rank).order_by('-search_rank', 'roll_number', 'id')
+
+
+def get_search_backend(using='default'):
+    """Backend from settings.STUDENT_SEARCH_BACKEND, or picked by database vendor."""
+    path = getattr(settings, 'STUDENT_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connections[using].vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return BasicSearchBackend()
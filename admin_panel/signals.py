@@ -0,0 +1,51 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from student_management.models import (
+    AddOnCourse, CoursePurchaseRequest, CustomUser, Department, purchase_requests_bulk_updated,
+)
+from . import analytics
+from .models import CourseStats, DepartmentStats
+
+
+# keep the analytics summary tables (analytics.py) in step with every change
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:  # loaddata: run rebuild_analytics afterwards
+        analytics.user_saved(instance, created)
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    analytics.user_deleted(instance)
+
+
+@receiver(post_save, sender=CoursePurchaseRequest)
+def purchase_request_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        analytics.request_saved(instance, created)
+
+
+@receiver(post_delete, sender=CoursePurchaseRequest)
+def purchase_request_deleted(sender, instance, **kwargs):
+    analytics.request_deleted(instance)
+
+
+@receiver(purchase_requests_bulk_updated)
+def purchase_requests_bulk_updated_handler(sender, rows, old_status, new_status, **kwargs):
+    analytics.requests_bulk_updated(rows, old_status, new_status)
+
+
+# a row of zeros for every new department / course, so the dashboard lists them at once
+
+@receiver(post_save, sender=Department)
+def department_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        DepartmentStats.objects.get_or_create(department=instance)
+
+
+@receiver(post_save, sender=AddOnCourse)
+def course_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CourseStats.objects.get_or_create(course=instance)
@@ -0,0 +1,20 @@
+from django import template
+
+register = template.Library()
+
+
+# {% elided_pages students as pages %} -> 1 … 7 8 [9] 10 11 … 4000
+# a fixed number of links whatever the page count; ellipsis entries equal paginator.ELLIPSIS
+@register.simple_tag
+def elided_pages(page, on_each_side=2, on_ends=1):
+    return page.paginator.get_elided_page_range(page.number, on_each_side=on_each_side, on_ends=on_ends)
+
+
+# {% student_row_version student as version %} -> fragment cache key part of a student list row.
+# Changes when the user row or one of their requests is saved (updated_at) and when a
+# request is added / deleted (the ids). Uses the prefetched requests, so no query.
+@register.simple_tag
+def student_row_version(student):
+    parts = [f'{student.pk}:{student.updated_at.timestamp()}']
+    parts.extend(f'{req.pk}:{req.updated_at.timestamp()}' for req in student.coursepurchaserequest_set.all())
+    return ','.join(parts)
@@ -1,3 +1,221 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import re
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.http import StreamingHttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from student_management.metrics import collect
+from student_management.models import AddOnCourse, CoursePurchaseRequest, CustomUser, Department, OutboundEmail
+from .analytics import drift
+from .templatetags.admin_lists import elided_pages
+from .models import CourseStats, DepartmentStats
+from .search import BasicSearchBackend
+
+
+class AdminTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='CS')
+        self.courses = [
+            AddOnCourse.objects.create(course=f'course {i}', description='d', price=10) for i in range(2)
+        ]
+        self.students = [
+            CustomUser.objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password='pw', department=self.department,
+            )
+            for i in range(3)
+        ]
+        self.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin)
+
+    def request(self, student, course):
+        return CoursePurchaseRequest.objects.create(student=student, course=course)
+
+
+class CourseRequestViewTests(AdminTestCase):
+    def test_approve_twice_sends_one_email(self):
+        purchase_request = self.request(self.students[0], self.courses[0])
+        url = reverse('approve_request', args=[purchase_request.pk])
+        self.client.post(url)
+        response = self.client.post(url, follow=True)
+        self.assertIn('already handled', response.content.decode())
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+        self.assertTrue(self.students[0].purchased_courses.filter(pk=self.courses[0].pk).exists())
+
+    def test_reject_after_complete_is_refused(self):
+        purchase_request = self.request(self.students[0], self.courses[0])
+        self.assertTrue(purchase_request.approve())
+        self.assertTrue(purchase_request.complete())
+        self.client.post(reverse('reject_request', args=[purchase_request.pk]))
+        purchase_request.refresh_from_db()
+        self.assertEqual(purchase_request.status, 'completed')
+
+    def test_approve_and_reject_need_post(self):
+        purchase_request = self.request(self.students[0], self.courses[0])
+        for name in ('approve_request', 'reject_request'):
+            self.assertEqual(self.client.get(reverse(name, args=[purchase_request.pk])).status_code, 405)
+        purchase_request.refresh_from_db()
+        self.assertEqual(purchase_request.status, 'pending')
+
+    def test_bulk_approve_queues_emails(self):
+        requests = [self.request(student, self.courses[0]) for student in self.students]
+        self.request(self.students[0], self.courses[1])  # not selected
+        self.client.post(reverse('bulk_course_requests'), {
+            'action': 'approve', 'ids': [str(purchase_request.pk) for purchase_request in requests[:2]],
+        })
+        self.assertEqual(
+            sorted(CoursePurchaseRequest.objects.filter(status='approved').values_list('id', flat=True)),
+            [requests[0].pk, requests[1].pk],
+        )
+        self.assertEqual(
+            sorted(address for email in OutboundEmail.objects.all() for address in email.to),
+            ['student0@example.com', 'student1@example.com'],
+        )
+
+
+class ExportTests(AdminTestCase):
+    def setUp(self):
+        super().setUp()
+        for student, gender in zip(self.students, ('Male', 'Female', 'Female')):
+            student.gender = gender
+            student.save()
+
+    def export(self, **params):
+        response = self.client.get(reverse('std_export'), params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_follows_the_filters(self):
+        rows = list(csv.DictReader(self.export(gender='Female').splitlines()))
+        self.assertEqual([row['username'] for row in rows], ['student1', 'student2'])
+        self.assertEqual({row['department'] for row in rows}, {'CS'})
+
+        rows = list(csv.DictReader(self.export(q='student1').splitlines()))
+        self.assertEqual([row['username'] for row in rows], ['student1'])
+
+    def test_jsonl(self):
+        lines = self.export(format='jsonl', q='student', gender='Male').splitlines()
+        self.assertEqual([json.loads(line)['username'] for line in lines], ['student0'])
+
+
+class MetricsTests(AdminTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(METRICS_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def stats(self, view):
+        stats = collect().get(view, {})
+        return stats.get('requests', {}).get('200', 0), stats.get('queries', 0), stats.get('response_bytes', 0)
+
+    def test_request_is_recorded(self):
+        requests, queries, size = self.stats('std_view')
+        response = self.client.get(reverse('std_view'))
+        self.assertIn('queries', response['Server-Timing'])
+        after = self.stats('std_view')
+        self.assertEqual(after[0], requests + 1)
+        self.assertGreater(after[1], queries)
+        self.assertEqual(after[2], size + len(response.content))
+
+    def test_streamed_export_is_recorded_once_consumed(self):
+        requests, queries, size = self.stats('std_export')
+        response = self.client.get(reverse('std_export'))
+        content = b''.join(response.streaming_content)
+        after = self.stats('std_export')
+        self.assertEqual(after[0], requests + 1)
+        # the header went out before the rows were read, the recorded count includes them
+        header_queries = int(re.search(r'"(\d+) queries"', response['Server-Timing']).group(1))
+        self.assertGreater(after[1] - queries, header_queries)
+        self.assertEqual(after[2], size + len(content))
+
+    def test_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+        self.client.force_login(self.students[0])
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 302)
+
+
+class StudentListTests(AdminTestCase):
+    def page(self):
+        return self.client.get(reverse('std_view')).content.decode()
+
+    def test_cached_row_follows_the_student_and_their_requests(self):
+        purchase_request = self.request(self.students[0], self.courses[0])
+        self.assertIn('Pending', self.page())
+
+        purchase_request.approve()
+        self.assertNotIn('Pending', self.page())
+
+        self.students[0].place = 'Kochi'
+        self.students[0].save()
+        self.assertIn('Kochi', self.page())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.department.name = 'Computer Science'
+            self.department.save()
+        self.assertIn('Computer Science', self.page())
+
+    def test_page_links_are_elided(self):
+        page = Paginator(range(1000), 10).page(50)
+        numbers = list(elided_pages(page))
+        self.assertEqual(numbers, [1, page.paginator.ELLIPSIS, 48, 49, 50, 51, 52, page.paginator.ELLIPSIS, 100])
+
+
+class AnalyticsTests(AdminTestCase):
+    def test_counters_follow_approve_and_delete(self):
+        purchase_request = self.request(self.students[0], self.courses[0])
+        self.request(self.students[1], self.courses[0])
+        self.client.post(reverse('approve_request', args=[purchase_request.pk]))
+        stats = CourseStats.objects.get(course=self.courses[0])
+        self.assertEqual((stats.pending, stats.approved), (1, 1))
+
+        self.students[1].delete()  # cascades to their request
+        stats.refresh_from_db()
+        self.assertEqual((stats.pending, stats.approved), (0, 1))
+        self.assertEqual(DepartmentStats.objects.get(department=self.department).students, 2)
+        self.assertEqual(drift(), [])
+
+    def test_counters_follow_import(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'students.csv')
+        with open(path, 'w') as csv_file:
+            # no passwords: nothing to hash, so no worker process is started
+            csv_file.write('username,email,password,date_of_birth,age,gender,place,phone,department\n')
+            for i in range(2):
+                csv_file.write(f'imported{i},imported{i}@example.com,,2001-02-03,19,Female,p,123,cs\n')
+        call_command('import_students', path, workers=1, stdout=StringIO())
+
+        self.assertEqual(CustomUser.objects.filter(username__startswith='imported').count(), 2)
+        self.assertEqual(DepartmentStats.objects.get(department=self.department).students, 5)
+        self.assertEqual(drift(), [])
+
+
+class SearchTests(AdminTestCase):
+    def test_numeric_query_keeps_text_matches(self):
+        numeric = CustomUser.objects.create_user(username='2024', email='n@example.com', password='pw')
+        roll_match = self.students[0]
+        roll_match.roll_number = 2024
+        roll_match.save()
+        backend = BasicSearchBackend()
+        found = backend.rank(backend.filter(CustomUser.objects.all(), '2024'), '2024')
+        self.assertEqual(list(found), [roll_match, numeric])
+
+
+class StaffOnlyViewTests(AdminTestCase):
+    def test_pool_stats_checks_the_user_not_the_role_claim(self):
+        self.assertEqual(self.client.get(reverse('db_pool_stats')).status_code, 200)
+        # demoted: the session's role claim still says admin for up to ROLE_CLAIM_MAX_AGE
+        self.admin.is_staff = self.admin.is_superuser = False
+        self.admin.save()
+        self.assertEqual(self.client.get(reverse('db_pool_stats')).status_code, 302)
@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.std_view, name='std_view'),       
+    path('export/', views.std_export, name='std_export'),
     path('add/', views.std_add, name='std_add'),        
     path('edit/<int:pk>/', views.std_edit, name='std_edit'),  
     path('delete/<int:pk>/', views.std_delete, name='std_delete'), 
@@ -13,6 +14,10 @@ urlpatterns = [
     path("courses/<int:course_id>/edit/", views.course_edit, name="course_edit"),
     path("courses/<int:course_id>/delete/", views.course_delete, name="course_delete"),
     path('course-requests/', views.manage_course_requests, name='manage_course_requests'),
+    path('course-requests/bulk/', views.bulk_course_requests, name='bulk_course_requests'),
     path('course-requests/approve/<int:request_id>/', views.approve_request, name='approve_request'),
     path('course-requests/reject/<int:request_id>/', views.reject_request, name='reject_request'),
+    path('pool-stats/', views.db_pool_stats, name='db_pool_stats'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('dashboard/', views.dashboard, name='dashboard'),
 ]
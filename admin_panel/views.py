@@ -1,3 +1,7 @@
+import csv
+import json
+import os
+
 from django.shortcuts import render
 from student_management.models import CustomUser
 from django.contrib.auth.decorators import login_required, user_passes_test
@@ -7,59 +11,165 @@ from .forms import FullCustomUserChangeForm
 from django.contrib import messages
 from django.shortcuts import get_object_or_404
 from student_management.models import Department,AddOnCourse,CoursePurchaseRequest
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.core.mail import send_mail
+from django.db import connection, router, transaction
+from django.db.models import Count, Max
+from django.views.decorators.http import require_POST
+from student_management.mail import queue_mail, queue_mail_batch
+from student_management.conditional import conditional_page
+from student_management.metrics import collect, render_prometheus
 from django.conf import settings
-from django.utils import timezone
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from .analytics import dashboard_data
+from .pagination import KeysetPaginator, estimate_count
+from .search import get_search_backend
+from student_management.reference_data import current_version, get_courses, get_departments
+from student_management.replicas import replica_reads
+
 
 
+# q / gender filters shared by the student list and the export
+def filter_students(query, gender_filter):
+    students = CustomUser.objects.all().order_by('roll_number', 'id')
+    if query:
+        students = get_search_backend().filter(students, query)  # see admin_panel/search.py
+    if gender_filter:
+        students = students.filter(gender=gender_filter)
+    return students
+
+
+# everything a student_view.html row shows, so rendering a page runs no extra queries
+STUDENT_ROW_PREFETCH = ('coursepurchaserequest_set__course',)
+
+
+# student_view.html caches every row; department / course names shown in a row change with
+# these versions, the row's own changes with {% student_row_version %} (templatetags/admin_lists.py)
+def row_cache_context():
+    return {
+        'row_cache_version': f"{current_version('departments')}:{current_version('courses')}",
+        'row_cache_timeout': getattr(settings, 'STUDENT_ROW_CACHE_TIMEOUT', 600),
+    }
+
 
 @login_required
+@replica_reads
 def std_view(request):
     query = request.GET.get('q', '')  # Get search query
     gender_filter = request.GET.get('gender', '')
     
-    students = CustomUser.objects.all().order_by('roll_number')
-    
-    if query:
-        students = students.filter(
-            Q(username__icontains=query) |
-            Q(email__icontains=query) |
-            Q(roll_number__icontains=query) |
-            Q(department__name__icontains=query)
-        )
-        
-    if gender_filter:
-        students = students.filter(gender=gender_filter)
+    students = filter_students(query, gender_filter)
+    students = students.select_related('department').prefetch_related(*STUDENT_ROW_PREFETCH)
+
+    # mode=page -> numbered pages (needs COUNT + OFFSET, fine for small results)
+    # mode=cursor -> keyset pages on (roll_number, id), same cost at any depth
+    # no mode -> cursor if a cursor is given or the planner thinks the result is big
+    mode = request.GET.get('mode', '')
+    after = request.GET.get('after', '')
+    before = request.GET.get('before', '')
+    if mode not in ('page', 'cursor'):
+        if after or before:
+            mode = 'cursor'
+        else:
+            estimate = estimate_count(students)
+            threshold = getattr(settings, 'STUDENT_LIST_CURSOR_THRESHOLD', 10000)
+            mode = 'cursor' if estimate is not None and estimate > threshold else 'page'
 
-    # Pagination: 10 students per page
-    paginator = Paginator(students, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if mode == 'cursor':
+        # count=none skips counting, count=exact runs COUNT(*), default is the planner estimate
+        count_mode = request.GET.get('count', 'estimate')
+        if count_mode not in ('exact', 'estimate'):
+            count_mode = None
+        paginator = KeysetPaginator(students, 5, keys=('roll_number', 'id'))
+        page_obj = paginator.get_page(after=after, before=before, count=count_mode)
+    else:
+        # search results are ranked best match first (cursor mode keeps roll number order)
+        if query:
+            students = get_search_backend().rank(students, query)
+        # Pagination: 5 students per page
+        paginator = Paginator(students, 5)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
 
     context = {
         'students': page_obj,
         'query': query,
         'gender_filter': gender_filter,
+        'cursor_mode': mode == 'cursor',
+        **row_cache_context(),
     }
     return render(request, 'student_view.html', context)
 
 
+# columns of the roster export, department name comes from a JOIN in the same query
+EXPORT_COLUMNS = [
+    ('roll_number', 'roll_number'), ('username', 'username'), ('email', 'email'),
+    ('age', 'age'), ('gender', 'gender'), ('place', 'place'), ('phone', 'phone'),
+    ('department', 'department__name'), ('year_of_admission', 'year_of_admission'),
+    ('date_of_birth', 'date_of_birth'),
+]
+
+
+class Echo:
+    """csv.writer target that just hands back the line (django docs streaming csv pattern)"""
+    def write(self, value):
+        return value
+
+
+@login_required
+@replica_reads
+def std_export(request):
+    query = request.GET.get('q', '')
+    gender_filter = request.GET.get('gender', '')
+    export_format = request.GET.get('format', 'csv')
+
+    headers = [name for name, _ in EXPORT_COLUMNS]
+    rows = (
+        filter_students(query, gender_filter)
+        # alias picked now: the generators run after the view returned, outside @replica_reads
+        .using(router.db_for_read(CustomUser))
+        .values_list(*[column for _, column in EXPORT_COLUMNS])
+        .iterator(chunk_size=2000)  # server side cursor on postgres, memory stays flat
+    )
+
+    # generators: the header goes out before the query even runs
+    if export_format == 'jsonl':
+        def stream():
+            for row in rows:
+                yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + '\n'
+        response = StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+        filename = 'students.jsonl'
+    else:
+        writer = csv.writer(Echo())
+        def stream():
+            yield writer.writerow(headers)
+            for row in rows:
+                yield writer.writerow(row)
+        response = StreamingHttpResponse(stream(), content_type='text/csv')
+        filename = 'students.csv'
+
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 def std_add(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST ,request.FILES)
-        if form.is_valid():
-            student=form.save()
-            subject = "Welcome to ABC College of Arts and Science"
-            message = f"Hi {student.username},\n\nWelcome! Your account has been successfully created."
-            recipient = student.email
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [recipient])
-            messages.success(request, 'Student added successfully!')
-            return redirect('std_view')
-        else:
-            messages.error(request, 'Please correct the errors below.')
+        try:
+            if form.is_valid():
+                with transaction.atomic():
+                    student=form.save()
+                    subject = "Welcome to ABC College of Arts and Science"
+                    message = f"Hi {student.username},\n\nWelcome! Your account has been successfully created."
+                    recipient = student.email
+                    queue_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [recipient])
+                messages.success(request, 'Student added successfully!')
+                return redirect('std_view')
+        except ValidationError:
+            pass  # username / email taken meanwhile, the error is on the form
+        messages.error(request, 'Please correct the errors below.')
     else:
         form = CustomUserCreationForm()
     return render(request, 'student_add.html', {'form': form})
@@ -69,12 +179,14 @@ def std_edit(request, pk):
     student = get_object_or_404(CustomUser, pk=pk)
     if request.method == 'POST':
         form = FullCustomUserChangeForm(request.POST, request.FILES, instance=student)
-        if form.is_valid():
-            form.save()
-            messages.success(request, 'Student updated successfully!')
-            return redirect('std_view')
-        else:
-            messages.error(request, 'Please correct the errors below.')
+        try:
+            if form.is_valid():
+                form.save()
+                messages.success(request, 'Student updated successfully!')
+                return redirect('std_view')
+        except ValidationError:
+            pass  # username / email / roll number taken meanwhile, the error is on the form
+        messages.error(request, 'Please correct the errors below.')
     else:
         form = FullCustomUserChangeForm(instance=student)
     return render(request, 'student_edit.html', {'form': form})
@@ -102,7 +214,7 @@ def department_add(request):
             messages.error(request, 'Department name cannot be empty.')
 
     # Show all departments
-    departments = Department.objects.all()
+    departments = get_departments()  # cached reference data
     return render(request, 'dept.html', {'departments': departments})
 
 @login_required
@@ -124,6 +236,7 @@ def delete_department(request, dept_id):
 
 #course managae(add,edit,delete)   
 @login_required
+@conditional_page(lambda request: [current_version('courses')])  # the list is the cached courses
 def course_manage(request):
     if request.method == "POST":
         course = request.POST.get("title")
@@ -144,7 +257,7 @@ def course_manage(request):
         else:
             messages.error(request, "Course course cannot be empty.")
 
-    courses = AddOnCourse.objects.all().order_by('id')
+    courses = get_courses()  # cached reference data, ordered by id
     return render(request, "addoncourse.html", {"courses": courses})
 
 
@@ -168,40 +281,143 @@ def course_delete(request, course_id):
         messages.success(request, "Course deleted successfully!")
         return redirect("course_manage")
 
+# version stamp of the pending queue for the ETag: one aggregate over the pending rows
+# (partial index purchase_pending_idx). A row leaving the queue lowers the count, one
+# joining it or an edited row / student moves a max(updated_at); course names come with
+# the courses version.
+def course_queue_stamps(request):
+    queue = CoursePurchaseRequest.objects.filter(status='pending').aggregate(
+        count=Count('id'), latest=Max('updated_at'), latest_student=Max('student__updated_at'),
+    )
+    return [queue['count'], queue['latest'], queue['latest_student'], current_version('courses')]
+
+
 #notif
 @login_required
+@replica_reads
+@conditional_page(course_queue_stamps)
 def manage_course_requests(request):
-    requests = CoursePurchaseRequest.objects.filter(status='pending')
-    return render(request, 'manage_course.html', {'requests': requests})
+    requests = CoursePurchaseRequest.objects.filter(status='pending').select_related('student', 'course')
+    return render(request, 'manage_course.html', {'requests': requests, 'courses': get_courses()})
 
-# Approve request
-@login_required
-def approve_request(request, request_id):
-    purchase_request = get_object_or_404(CoursePurchaseRequest, id=request_id)
-    purchase_request.status = 'approved'
-    purchase_request.approved_at = timezone.now()
-    purchase_request.save()
-
-    # Add course to student purchased_courses
-    purchase_request.student.purchased_courses.add(purchase_request.course)
-    # Send email notification
-    subject = f'Course Approved: {purchase_request.course.course}'
-    message = f'Hello {purchase_request.student.username},\n\n' \
-              f'Your purchase request for the course "{purchase_request.course.course}" has been approved.\n' \
+def approval_email(username, course_name):
+    subject = f'Course Approved: {course_name}'
+    message = f'Hello {username},\n\n' \
+              f'Your purchase request for the course "{course_name}" has been approved.\n' \
               f'You can now access the course in your profile.\n\n' \
               'Happy Learning!\nStudent Management Team'
-    recipient = [purchase_request.student.email]
+    return subject, message
 
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, recipient, fail_silently=False)
-    
-    messages.success(request, f'Course "{purchase_request.course.course}" approved for {purchase_request.student.username}.')
+
+# Bulk approve / reject: selected ids, or every pending request for one course.
+# A fixed handful of queries (lock, UPDATE, through-row INSERT, outbox INSERT) for any number of rows.
+@login_required
+def bulk_course_requests(request):
+    if request.method != 'POST':
+        return redirect('manage_course_requests')
+
+    action = request.POST.get('action')
+    pending = CoursePurchaseRequest.objects.filter(status='pending')
+    if request.POST.get('scope') == 'course':
+        course_id = request.POST.get('course')
+        if not course_id or not course_id.isdigit():
+            messages.error(request, 'Choose a course.')
+            return redirect('manage_course_requests')
+        selected = pending.filter(course_id=int(course_id))
+    else:
+        ids = [int(pk) for pk in request.POST.getlist('ids') if pk.isdigit()]
+        if not ids:
+            messages.error(request, 'No requests selected.')
+            return redirect('manage_course_requests')
+        selected = pending.filter(id__in=ids)
+
+    with transaction.atomic():
+        if action == 'approve':
+            rows = selected.bulk_approve()
+            queue_mail_batch(
+                approval_email(row['student__username'], row['course__course'])
+                + (settings.DEFAULT_FROM_EMAIL, [row['student__email']])
+                for row in rows
+            )
+            messages.success(request, f'{len(rows)} request(s) approved.')
+        elif action == 'reject':
+            rows = selected.bulk_reject()
+            messages.success(request, f'{len(rows)} request(s) rejected.')
+        else:
+            messages.error(request, 'Unknown action.')
+    return redirect('manage_course_requests')
+
+
+# shared by the sync and async approve views; False if the request was not pending any more
+def approve_purchase(purchase_request):
+    with transaction.atomic():
+        # conditional UPDATE + course grant (CoursePurchaseRequest.approve), a second click loses
+        if not purchase_request.approve():
+            return False
+        # Queue email notification (sent by `manage.py send_outbox`)
+        subject, message = approval_email(purchase_request.student.username, purchase_request.course.course)
+        recipient = [purchase_request.student.email]
+
+        queue_mail(subject, message, settings.DEFAULT_FROM_EMAIL, recipient)
+    return True
+
+
+def already_handled(request, purchase_request):
+    messages.info(
+        request,
+        f'The request for "{purchase_request.course.course}" by {purchase_request.student.username} was already handled.',
+    )
+
+
+# Approve request
+@login_required
+@require_POST
+def approve_request(request, request_id):
+    purchase_request = get_object_or_404(CoursePurchaseRequest.objects.select_related('student', 'course'), id=request_id)
+    if approve_purchase(purchase_request):
+        messages.success(request, f'Course "{purchase_request.course.course}" approved for {purchase_request.student.username}.')
+    else:
+        already_handled(request, purchase_request)
     return redirect('manage_course_requests')
 
 # Reject request
 @login_required
+@require_POST
 def reject_request(request, request_id):
-    purchase_request = get_object_or_404(CoursePurchaseRequest, id=request_id)
-    purchase_request.status = 'rejected'
-    purchase_request.save()
-    messages.success(request, f'Course "{purchase_request.course.course}" rejected for {purchase_request.student.username}.')
-    return redirect('manage_course_requests')
\ No newline at end of file
+    purchase_request = get_object_or_404(CoursePurchaseRequest.objects.select_related('student', 'course'), id=request_id)
+    if purchase_request.reject():  # only a pending request can be rejected
+        messages.success(request, f'Course "{purchase_request.course.course}" rejected for {purchase_request.student.username}.')
+    else:
+        already_handled(request, purchase_request)
+    return redirect('manage_course_requests')
+
+
+# connection pool numbers for THIS worker process (each worker has its own pool),
+# use them to size DB_POOL_MAX_SIZE against the number of workers
+@login_required
+@user_passes_test(lambda user: user.is_staff or user.is_superuser)
+def db_pool_stats(request):
+    stats = {'pid': os.getpid(), 'mode': settings.DB_CONNECTIONS}
+    if connection.vendor == 'postgresql' and settings.DATABASES['default'].get('OPTIONS', {}).get('pool'):
+        pool_stats = connection.pool.get_stats()
+        stats.update(pool_stats)
+        if pool_stats.get('requests_num'):
+            stats['avg_wait_ms'] = pool_stats.get('requests_wait_ms', 0) / pool_stats['requests_num']
+    else:
+        stats['conn_max_age'] = settings.DATABASES['default'].get('CONN_MAX_AGE', 0)
+    return JsonResponse(stats)
+
+
+# per-view request metrics of all worker processes (Prometheus text format), see
+# student_management/metrics.py
+@login_required
+@user_passes_test(lambda user: user.is_staff or user.is_superuser)
+def metrics(request):
+    return HttpResponse(render_prometheus(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# analytics dashboard, read from the summary tables (analytics.py): two small queries
+# whatever the number of students / requests
+@login_required
+def dashboard(request):
+    return render(request, 'dashboard.html', dashboard_data())
@@ -1,7 +1,8 @@
 from django.contrib import admin
-from .models import CustomUser, Department
+from .models import CustomUser, Department, OutboundEmail
 from django.contrib.auth.admin import UserAdmin
 
 admin.site.register(Department)
 admin.site.register(CustomUser, UserAdmin)
+admin.site.register(OutboundEmail)
 
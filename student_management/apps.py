@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StudentManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'student_management'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects the cache invalidation receivers)
@@ -0,0 +1,48 @@
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from .conditional import conditional_page
+from .models import AddOnCourse, CoursePurchaseRequest, CustomUser, Department
+from .profile_cache import get_profile_payload
+from .reference_data import get_courses
+from .views import profile_stamps
+
+
+# Async versions of the hot student views, routed by Student/urls_async.py when served
+# through Student/asgi.py. Same templates and context as views.py.
+
+@login_required
+@conditional_page(profile_stamps)
+async def profile_view(request):
+    user = await request.auser()
+    # the template shows user.department: make sure it is loaded before rendering
+    if user.department_id and not CustomUser.department.field.is_cached(user):
+        user.department = await Department.objects.filter(pk=user.department_id).afirst()
+    courses = await sync_to_async(get_courses)()
+    payload = await sync_to_async(get_profile_payload)(user)
+    context = {
+        'user': user,
+        'courses': courses,
+        **payload,
+    }
+    return render(request, 'profile.html', context)
+
+
+@login_required
+async def purchase_course(request, course_id):
+    user = await request.auser()
+    course = await aget_object_or_404(AddOnCourse, id=course_id)
+    # Check if already purchased
+    if await user.purchased_courses.filter(id=course.id).aexists():
+        messages.info(request, f'You already own "{course.course}".')
+        return redirect('profile')
+    # Check if there is already a pending request
+    if await CoursePurchaseRequest.objects.filter(student=user, course=course, status='pending').aexists():
+        messages.info(request, f'Your purchase request for "{course.course}" is already pending.')
+        return redirect('profile')
+    # Create a pending purchase request
+    await CoursePurchaseRequest.objects.acreate(student=user, course=course)
+    messages.success(request, f'Your purchase request for "{course.course}" has been submitted and is pending approval.')
+    return redirect('profile')
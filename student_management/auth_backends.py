@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .models import CustomUser
+
+
+# Authentication backend that serves request.user from the cache.
+# Stock ModelBackend.get_user runs a SELECT on the (wide) CustomUser table on every request.
+# Here the user (with department joined) is cached per id; Django still compares the session's
+# auth hash with user.get_session_auth_hash() on every request, so a stale entry can never log
+# anyone in. Entries are dropped on CustomUser save/delete (signals.py), which covers password
+# changes, and for all its members when a Department is saved or deleted; code that changes
+# users with queryset.update() must call invalidate_cached_user().
+
+def user_cache_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def invalidate_cached_user(*user_ids):
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = CustomUser._default_manager.select_related('department').get(pk=user_id)
+            except CustomUser.DoesNotExist:
+                return None
+            cache.set(key, user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300))
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        # same as get_user for the async views (ASGI), without a thread hop
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            try:
+                user = await CustomUser._default_manager.select_related('department').aget(pk=user_id)
+            except CustomUser.DoesNotExist:
+                return None
+            await cache.aset(key, user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300))
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,66 @@
+import functools
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+
+# Conditional GET for pages that are polled (profile, course catalog, request queue).
+#
+#   @conditional_page(lambda request: [stamp, ...])
+#
+# The stamps are cheap version markers of everything the page shows (cache version tokens,
+# at most one indexed aggregate query). Together with the user and their row's updated_at
+# they are hashed into the ETag. A GET whose If-None-Match matches gets a 304 before the
+# view runs: no payload, no template.
+# Pages are `Cache-Control: private, no-cache` and `Vary: Cookie`, so the browser revalidates
+# on every load and keeps the copies of different sessions / CSRF cookies apart.
+# No ETag while flash messages wait to be shown: a 304 would hide them.
+
+
+def page_etag(request, stamps):
+    if len(get_messages(request)):
+        return None  # loading them does not mark them as seen, they still show on the next page
+    user = request.user
+    parts = [
+        user.pk,
+        user.updated_at.timestamp() if getattr(user, 'updated_at', None) else '',
+        *stamps,
+    ]
+    return quote_etag(hashlib.sha256(':'.join(str(part) for part in parts).encode()).hexdigest()[:32])
+
+
+def conditional_page(stamp_func):
+    def decorator(view):
+        def etag_for(request):
+            if request.method not in ('GET', 'HEAD'):
+                return None
+            return page_etag(request, stamp_func(request))
+
+        def finish(response, etag):
+            if etag and response.status_code in (200, 304):
+                response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                etag = await sync_to_async(etag_for)(request)  # the stamps may query
+                not_modified = etag and get_conditional_response(request, etag=etag)
+                if not_modified:
+                    return finish(not_modified, etag)
+                return finish(await view(request, *args, **kwargs), etag)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                etag = etag_for(request)
+                not_modified = etag and get_conditional_response(request, etag=etag)
+                if not_modified:
+                    return finish(not_modified, etag)
+                return finish(view(request, *args, **kwargs), etag)
+        return wrapper
+    return decorator
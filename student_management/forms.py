@@ -1,15 +1,125 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm, AuthenticationForm,UserChangeForm
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.contrib.auth.forms import UserCreationForm, AuthenticationForm,UserChangeForm, PasswordResetForm
+from django.template import loader
 from .models import CustomUser, Department
+from .mail import queue_mail
+from .reference_data import get_departments
+
+
+# ModelChoiceField that reads its options from the reference data cache (reference_data.py)
+# instead of querying on every render / validation.
+class CachedModelChoiceIterator(forms.models.ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.loader():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.loader()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.loader())
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    iterator = CachedModelChoiceIterator
+
+    def __init__(self, loader, *args, **kwargs):
+        self.loader = loader  # function returning the cached list of objects
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        self.validate_no_null_characters(value)
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        for obj in self.loader():
+            if str(obj.pk) == str(value):
+                return obj
+        raise forms.ValidationError(
+            self.error_messages['invalid_choice'],
+            code='invalid_choice',
+            params={'value': value},
+        )
+
+
+# Uniqueness checks for the user forms.
+# ModelForm checks every unique field with its own query (plus one for each unique
+# constraint, plus UserCreationForm's case-insensitive username query). This mixin checks
+# all of `unique_fields` with ONE query, and save() turns an IntegrityError raised by the
+# database (the final authority, someone may have taken the name meanwhile) into the same
+# field error. With UNIQUE_PRECHECKS = False the query is skipped and only the database checks.
+class UniqueFieldsMixin:
+    unique_fields = {}  # field name -> (lookup 'exact' / 'iexact', error message)
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        # the case-insensitive email constraint would run its own query in full_clean();
+        # the email itself is already validated by the form's EmailField
+        exclude.add('email')
+        return exclude
+
+    def validate_unique(self):
+        if not getattr(settings, 'UNIQUE_PRECHECKS', True):
+            return
+        values = {
+            name: self.cleaned_data[name] for name in self.unique_fields
+            if self.cleaned_data.get(name) not in (None, '')
+        }
+        if not values:
+            return
+        condition = Q()
+        for name, value in values.items():
+            condition |= Q(**{f'{name}__{self.unique_fields[name][0]}': value})
+        taken = (
+            self._meta.model._default_manager
+            .exclude(pk=self.instance.pk).filter(condition)
+            .values_list(*values)
+        )
+        for row in taken:
+            for (name, value), other in zip(values.items(), row):
+                if self.matches(name, value, other) and name not in self.errors:
+                    self.add_error(name, self.unique_fields[name][1])
+
+    def matches(self, name, value, other):
+        if self.unique_fields[name][0] == 'iexact':
+            return str(value).lower() == str(other).lower()
+        return value == other
+
+    def save(self, commit=True):
+        if not commit:
+            return super().save(commit=False)
+        try:
+            with transaction.atomic():  # savepoint, the caller's transaction stays usable
+                return super().save(commit=True)
+        except IntegrityError as exc:
+            # constraint name on PostgreSQL, "UNIQUE constraint failed: <table.column / index>" on
+            # SQLite; neither contains the submitted values
+            diag = getattr(exc.__cause__, 'diag', None)
+            violated = getattr(diag, 'constraint_name', None) or str(exc)
+            field = next((name for name in self.unique_fields if name in violated), None)
+            if field is None:
+                if 'roll_number' not in violated:
+                    raise
+                # not a field of this form: CustomUser.save already retried the allocation
+                self.add_error(None, 'Could not assign a roll number, please submit the form again.')
+                raise forms.ValidationError(self.non_field_errors(), code='unique')
+            self.add_error(field, self.unique_fields[field][1])
+            raise forms.ValidationError(self.errors[field], code='unique')
 
 
 # Registration Form
-class CustomUserCreationForm(UserCreationForm):
+class CustomUserCreationForm(UniqueFieldsMixin, UserCreationForm):
     email = forms.EmailField(required=True)
     age = forms.IntegerField(required=True)
     place = forms.CharField(required=True)
     phone = forms.CharField(required=True, max_length=15)
-    department = forms.ModelChoiceField(queryset=Department.objects.all(), empty_label="Select Department")
+    department = CachedModelChoiceField(get_departments, queryset=Department.objects.all(), empty_label="Select Department")
     date_of_birth = forms.DateField(required=True,
         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
     profile_picture = forms.ImageField(required=False)
@@ -20,6 +130,15 @@ class CustomUserCreationForm(UserCreationForm):
             'phone', 'department','password1', 'password2',
         ] #give orderly how yo want
 
+    unique_fields = {
+        'username': ('iexact', 'A user with that username already exists.'),
+        'email': ('iexact', 'This email is already in use.'),
+    }
+
+    def clean_username(self):
+        # UserCreationForm runs its own username__iexact query here, validate_unique() covers it
+        return self.cleaned_data.get('username')
+
         
 # Login Form
 class CustomAuthenticationForm(AuthenticationForm):
@@ -29,7 +148,7 @@ class CustomAuthenticationForm(AuthenticationForm):
 
 
 # updation form
-class CustomUserChangeForm(UserChangeForm):
+class CustomUserChangeForm(UniqueFieldsMixin, UserChangeForm):
     password = None  # Hide password field
 
     class Meta:
@@ -48,16 +167,21 @@ class CustomUserChangeForm(UserChangeForm):
                     'type': 'date' }),
             }
 
-    def clean_email(self): 
-        email = self.cleaned_data.get('email') 
-        qs = CustomUser.objects.exclude(pk=self.instance.pk).filter(email=email)
-        if qs.exists():
-            raise forms.ValidationError("This email is already in use.")
-        return email
+    # both checked in one query, see UniqueFieldsMixin
+    unique_fields = {
+        'username': ('exact', "This username is already taken."),
+        'email': ('iexact', "This email is already in use."),
+    }
 
-    def clean_username(self):
-        username = self.cleaned_data.get('username')
-        qs = CustomUser.objects.exclude(pk=self.instance.pk).filter(username=username)
-        if qs.exists():
-            raise forms.ValidationError("This username is already taken.") #form field errros
-        return username
\ No newline at end of file
+
+# password reset form that puts the reset email in the outbox instead of sending inline
+class OutboxPasswordResetForm(PasswordResetForm):
+    def send_mail(self, subject_template_name, email_template_name, context,
+                  from_email, to_email, html_email_template_name=None):
+        subject = loader.render_to_string(subject_template_name, context)
+        subject = ''.join(subject.splitlines())  # Email subject *must not* contain newlines
+        body = loader.render_to_string(email_template_name, context)
+        html_body = None
+        if html_email_template_name is not None:
+            html_body = loader.render_to_string(html_email_template_name, context)
+        queue_mail(subject, body, from_email, [to_email], html_message=html_body)
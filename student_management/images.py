@@ -0,0 +1,135 @@
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+
+# Profile picture pipeline.
+#
+# On upload (CustomUser.save):
+#   - the file is named after the sha256 of its bytes: the same picture uploaded twice is
+#     stored once (profile_pics/<hash>.jpg) and the second upload skips all the work
+#   - EXIF orientation is applied, then all metadata is dropped by re-encoding
+#   - the stored original is capped at PROFILE_PICTURE_MAX_SIZE px on the long side
+#   - square thumbnails for PROFILE_THUMBNAIL_SIZES are written next to it (webp when Pillow
+#     has it, jpeg otherwise)
+# Templates use {% profile_thumbnail user.profile_picture 100 %} (templatetags/profile_images.py).
+# It never touches the disk (it runs for every row of the student list): a processed picture
+# links to its thumbnail, an older upload to the original. `manage.py process_profile_pictures`
+# converts older uploads and writes thumbnails that are missing (e.g. after adding a size).
+
+UPLOAD_DIR = 'profile_pics'
+THUMBNAIL_DIR = 'profile_pics/thumbs'
+
+
+def max_size():
+    return getattr(settings, 'PROFILE_PICTURE_MAX_SIZE', 1024)
+
+
+def thumbnail_sizes():
+    return getattr(settings, 'PROFILE_THUMBNAIL_SIZES', (100, 150))
+
+
+def thumbnail_format():
+    fmt = getattr(settings, 'PROFILE_THUMBNAIL_FORMAT', 'WEBP').upper()
+    if fmt == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return fmt
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(64 * 1024), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def encode(image, fmt, quality=85):
+    """Re-encode without any metadata (no exif / icc / xmp passed through)."""
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    options = {'quality': quality}
+    if fmt == 'JPEG':
+        options['optimize'] = True
+    out = io.BytesIO()
+    image.save(out, format=fmt, **options)
+    return out.getvalue()
+
+
+def open_image(file):
+    file.seek(0)
+    image = Image.open(file)
+    image = ImageOps.exif_transpose(image)  # apply orientation before the exif is dropped
+    return image
+
+
+def thumbnail_stem(original_name):
+    # with the original's extension: x.jpg and x.png must not share a thumbnail
+    stem, ext = os.path.splitext(os.path.basename(original_name))
+    return f'{stem}_{ext.lstrip(".").lower()}'
+
+
+def thumbnail_name(original_name, size):
+    ext = 'webp' if thumbnail_format() == 'WEBP' else 'jpg'
+    return f'{THUMBNAIL_DIR}/{thumbnail_stem(original_name)}_{size}.{ext}'
+
+
+def make_thumbnail(image, original_name, size):
+    name = thumbnail_name(original_name, size)
+    if not default_storage.exists(name):
+        thumb = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        default_storage.save(name, ContentFile(encode(thumb, thumbnail_format())))
+    return name
+
+
+def ensure_thumbnails(name):
+    """Write the thumbnails the stored picture `name` is missing, returns how many were written."""
+    missing = [size for size in thumbnail_sizes() if not default_storage.exists(thumbnail_name(name, size))]
+    if missing:
+        with default_storage.open(name, 'rb') as original:
+            image = open_image(original)
+            for size in missing:
+                make_thumbnail(image, name, size)
+    return len(missing)
+
+
+def is_processed(name):
+    if not name:
+        return False
+    stem, ext = os.path.splitext(os.path.basename(name))
+    return name.startswith(UPLOAD_DIR + '/') and ext == '.jpg' and len(stem) == 64
+
+
+def store_image(file):
+    """Store `file` through the pipeline (or find the identical one already stored), return its name."""
+    name = f'{UPLOAD_DIR}/{content_hash(file)}.jpg'
+    if not default_storage.exists(name):
+        image = open_image(file)
+        image.thumbnail((max_size(), max_size()), Image.LANCZOS)  # only ever shrinks
+        default_storage.save(name, ContentFile(encode(image, 'JPEG')))
+        for size in thumbnail_sizes():
+            make_thumbnail(image, name, size)
+    return name
+
+
+def store_profile_picture(field_file):
+    """Run an uncommitted upload through the pipeline and point the field at the stored file."""
+    name = store_image(field_file.file)
+    field_file.name = name
+    field_file._committed = True  # already in storage, FileField.pre_save must not save it again
+    return name
+
+
+def thumbnail_url(field_file, size):
+    """URL of the size x size thumbnail, the original's for a picture not run through the pipeline yet."""
+    if not field_file:
+        return ''
+    if not is_processed(field_file.name):
+        return field_file.url
+    return default_storage.url(thumbnail_name(field_file.name, size))
@@ -0,0 +1,128 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+# Outbox helpers.
+# Views call queue_mail() instead of send_mail(): it only INSERTs a row, so it is part of
+# the view's transaction (rolled back together with it) and costs no SMTP round trip.
+# `manage.py send_outbox` calls deliver_batch() to actually send them.
+
+def queue_mail(subject, message, from_email, recipient_list, html_message=None):
+    """Same arguments as django.core.mail.send_mail, but only writes to the outbox."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipient_list),
+    )
+
+
+def queue_mail_batch(emails):
+    """Queue many emails in one INSERT. emails: iterable of (subject, message, from_email, recipient_list)."""
+    return OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            subject=subject,
+            body=message,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=list(recipient_list),
+        )
+        for subject, message, from_email, recipient_list in emails
+    ])
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2*base, 4*base ... capped."""
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 30)
+    cap = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(cap, base * 2 ** max(attempts - 1, 0)))
+
+
+def build_message(email, connection):
+    msg = EmailMultiAlternatives(
+        email.subject, email.body, email.from_email, email.to, connection=connection,
+    )
+    if email.html_body:
+        msg.attach_alternative(email.html_body, 'text/html')
+    return msg
+
+
+def claim_batch(batch_size, now):
+    """
+    Lease up to batch_size due emails to this worker in one short transaction: status
+    'sending' until now + OUTBOX_LEASE_SECONDS (kept in next_attempt_at). SKIP LOCKED lets
+    several workers claim side by side; a worker that dies leaves its rows to be claimed
+    again once the lease runs out.
+    """
+    lease_until = now + timedelta(seconds=getattr(settings, 'OUTBOX_LEASE_SECONDS', 600))
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=('pending', 'sending'), next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(id__in=ids).update(status='sending', next_attempt_at=lease_until)
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def deliver_batch(batch_size=100, max_attempts=None, backend=None):
+    """
+    Send up to batch_size due emails over ONE connection.
+    The rows are claimed first (claim_batch) and the SMTP conversation runs outside any
+    transaction: no row locks are held while sending, and every result is recorded on its own
+    right after the send, so a later error can't undo a 'sent' and send the email twice.
+    The lease (OUTBOX_LEASE_SECONDS) has to be longer than a batch takes to send.
+    Returns (sent, failed) counts.
+    """
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    emails = claim_batch(batch_size, timezone.now())
+    if not emails:
+        return 0, 0
+    sent = failed = 0
+
+    connection = get_connection(backend=backend, fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        # can't even connect: every email in the batch counts as a failed attempt
+        for email in emails:
+            mark_failed(email, exc, max_attempts)
+        return 0, len(emails)
+
+    try:
+        for email in emails:
+            try:
+                build_message(email, connection).send()
+            except Exception as exc:
+                mark_failed(email, exc, max_attempts)
+                failed += 1
+            else:
+                OutboundEmail.objects.filter(pk=email.pk).update(
+                    status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1,
+                )
+                sent += 1
+    finally:
+        connection.close()
+
+    return sent, failed
+
+
+def mark_failed(email, exc, max_attempts):
+    attempts = email.attempts + 1
+    changes = {'attempts': attempts, 'last_error': f'{type(exc).__name__}: {exc}'}
+    if attempts >= max_attempts:
+        changes['status'] = 'dead'  # dead letter, stays in the table for inspection / requeue
+    else:
+        changes['status'] = 'pending'
+        changes['next_attempt_at'] = timezone.now() + retry_delay(attempts)
+    OutboundEmail.objects.filter(pk=email.pk).update(**changes)
@@ -0,0 +1,59 @@
+import time
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from student_management.middleware import BlockAccessMiddleware, remember_role
+from student_management.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ("Micro-benchmark of BlockAccessMiddleware: time and queries per request "
+            "for anonymous, student and admin traffic (session + auth middleware included).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        stack = SessionMiddleware(AuthenticationMiddleware(BlockAccessMiddleware(lambda request: HttpResponse('ok'))))
+
+        student = CustomUser.objects.filter(is_staff=False, is_superuser=False).first()
+        admin = CustomUser.objects.filter(is_superuser=True).first()
+        sessions = {'anonymous': None}
+        for name, user in (('student', student), ('admin', admin)):
+            if user is None:
+                self.stderr.write(f'no {name} user in the database, skipping')
+                continue
+            session = SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            remember_role(session, user)
+            session.save()
+            sessions[name] = session.session_key
+
+        paths = ['/static/student_management/style.css', '/', '/profile/', '/adm/']
+        self.stdout.write(f'{"traffic":<10} {"path":<40} {"us/request":>10} {"queries":>8}')
+        for name, session_key in sessions.items():
+            for path in paths:
+                request_count = options['iterations']
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    for _ in range(request_count):
+                        request = factory.get(path)
+                        if session_key:
+                            request.COOKIES['sessionid'] = session_key
+                        stack(request)
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{name:<10} {path:<40} {elapsed / request_count * 1e6:>10.1f} '
+                    f'{len(queries) / request_count:>8.2f}'
+                )
@@ -0,0 +1,220 @@
+import json
+import platform
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+
+import django
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from admin_panel import urls as admin_urls
+from student_management import urls as student_urls
+from student_management.models import CoursePurchaseRequest, CustomUser, Department
+
+
+# Per-view benchmark: every URL of student_management.urls and admin_panel.urls, requested
+# with GET through the test client as the kind of user that normally opens it.
+#
+#   manage.py seed_scale --students 50000
+#   manage.py bench_views --output baseline.json
+#   ... change something ...
+#   manage.py bench_views --baseline baseline.json --max-regression 20
+#
+# Per URL: wall time (median / mean / p95 / min over --iterations), queries and response bytes.
+# Every request runs inside a transaction that is rolled back, so views that write on GET
+# (delete, purchase ...) see the same database on every iteration and the
+# run leaves no trace. Queries are counted in one extra request, outside the timed ones
+# (capturing them slows the connection down).
+
+# no login needed; admin_panel URLs use the admin, the remaining ones a student
+ANONYMOUS_URLS = {
+    'home', 'register', 'login', 'password_reset', 'password_reset_done',
+    'password_reset_confirm', 'password_reset_complete',
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = "Benchmark every view (wall time, queries, bytes), optionally against a saved baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2, help='untimed requests per URL first')
+        parser.add_argument('--output', help='write the results as JSON to this file (- for stdout)')
+        parser.add_argument('--baseline', help='JSON file of an earlier run to compare with')
+        parser.add_argument('--max-regression', type=float,
+                            help='fail when a median gets slower than the baseline by more than this '
+                                 'many percent, or a view runs more queries')
+        parser.add_argument('--only', action='append', default=[], help='URL name to run (repeatable)')
+
+    def handle(self, *args, **options):
+        # the test client sends Host: testserver; everything else stays as configured, so the
+        # timings are those of the real settings (DEBUG, templates, email backend)
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            self.run(options)
+
+    def run(self, options):
+        self.users = self.pick_users()
+        samples = self.pick_samples()
+        results = {}
+        for name, url, user in self.targets(samples):
+            if options['only'] and name not in options['only']:
+                continue
+            results[name] = self.bench(url, user, options['iterations'], options['warmup'])
+            self.stdout.write(self.format_row(name, results[name]), ending='\n')
+
+        report = {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connections['default'].vendor,
+                'students': CustomUser.objects.filter(is_staff=False, is_superuser=False).count(),
+                'purchase_requests': CoursePurchaseRequest.objects.count(),
+                'iterations': options['iterations'],
+            },
+            'results': results,
+        }
+        if options['output'] == '-':
+            json.dump(report, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        elif options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f'results written to {options["output"]}')
+
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['max_regression'])
+
+    def pick_users(self):
+        admin = CustomUser.objects.filter(is_superuser=True).first()
+        # a student with something in every list of the profile page
+        student_id = (
+            CoursePurchaseRequest.objects.filter(status='approved', student__is_staff=False)
+            .values_list('student_id', flat=True).first()
+        )
+        if admin is None or student_id is None:
+            raise CommandError('needs a superuser and a student with an approved request (run seed_scale)')
+        return {'admin': admin, 'student': CustomUser.objects.get(pk=student_id), 'anonymous': None}
+
+    def pick_samples(self):
+        student = self.users['student']
+        pending = CoursePurchaseRequest.objects.filter(status='pending').first()
+        approved = CoursePurchaseRequest.objects.filter(student=student, status='approved').first()
+        department = Department.objects.first()
+        return {
+            'pk': student.pk,
+            'dept_id': department.pk if department else 0,
+            'request_id': pending.pk if pending else 0,
+            'course_id': approved.course_id,
+            'uidb64': urlsafe_base64_encode(force_bytes(student.pk)),
+            'token': default_token_generator.make_token(student),
+        }
+
+    def targets(self, samples):
+        for module, side in ((student_urls, 'student'), (admin_urls, 'admin')):
+            for pattern in module.urlpatterns:
+                name = pattern.name
+                kwargs = {key: samples[key] for key in pattern.pattern.converters}
+                if side == 'student' and name in ANONYMOUS_URLS:
+                    role = 'anonymous'
+                else:
+                    role = side
+                yield name, reverse(name, kwargs=kwargs), self.users[role]
+
+    def client_for(self, user):
+        client = Client(raise_request_exception=False)  # a broken view is reported as its 500
+        if user is not None:
+            client.force_login(user)
+        return client
+
+    def request(self, client, user, url):
+        """One GET inside a rolled back transaction, returns (seconds, status, bytes)."""
+        session = client.cookies.get(settings.SESSION_COOKIE_NAME)
+        if user is not None and (session is None or not session.value):
+            client.force_login(user)  # logout ended the session last time
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                response = client.get(url)
+                if response.streaming:
+                    size = sum(len(chunk) for chunk in response.streaming_content)
+                else:
+                    size = len(response.content)
+                elapsed = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+        return elapsed, response.status_code, size
+
+    def bench(self, url, user, iterations, warmup):
+        client = self.client_for(user)
+        for _ in range(warmup):
+            self.request(client, user, url)
+        timings = []
+        for _ in range(iterations):
+            elapsed, status, size = self.request(client, user, url)
+            timings.append(elapsed * 1000)
+
+        with ExitStack() as stack:
+            captures = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+            self.request(client, user, url)
+        queries = sum(len(capture) for capture in captures)
+
+        return {
+            'url': url,
+            'user': 'anonymous' if user is None else ('admin' if user.is_superuser else 'student'),
+            'status': status,
+            'median_ms': round(statistics.median(timings), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'min_ms': round(min(timings), 3),
+            'queries': queries,
+            'bytes': size,
+        }
+
+    def format_row(self, name, result):
+        return (f'{name:<28} {result["status"]:>4} {result["median_ms"]:>9.2f} ms '
+                f'{result["p95_ms"]:>9.2f} p95 {result["queries"]:>4} q {result["bytes"]:>9} B')
+
+    def compare(self, results, path, max_regression):
+        try:
+            with open(path) as baseline_file:
+                baseline = json.load(baseline_file)['results']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'cannot read baseline {path}: {exc}')
+
+        self.stdout.write(f'\n{"view":<28} {"median ms":>20} {"change":>8} {"queries":>9} {"bytes":>16}')
+        regressions = []
+        for name, result in results.items():
+            old = baseline.get(name)
+            if old is None:
+                self.stdout.write(f'{name:<28} (not in baseline)')
+                continue
+            change = (result['median_ms'] - old['median_ms']) / old['median_ms'] * 100 if old['median_ms'] else 0.0
+            self.stdout.write(
+                f'{name:<28} {old["median_ms"]:>9.2f} -> {result["median_ms"]:>7.2f} {change:>+7.1f}% '
+                f'{old["queries"]:>4} -> {result["queries"]:<3} {old["bytes"]:>7} -> {result["bytes"]}'
+            )
+            if max_regression is not None and (change > max_regression or result['queries'] > old['queries']):
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(f'regressed: {", ".join(regressions)}')
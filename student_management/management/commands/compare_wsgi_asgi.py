@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+from student_management.models import CustomUser
+
+
+# Throughput of the hot pages through the WSGI handler (sync views, one request at a time
+# per worker thread) and the ASGI handler (async views, --concurrency requests in flight).
+# In-process and against the configured database; absolute numbers depend on the database
+# latency, which is exactly what the async views are meant to hide.
+
+class Command(BaseCommand):
+    help = "Compare requests/second of the hot views under WSGI and ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='requests per URL')
+        parser.add_argument('--concurrency', type=int, default=20, help='ASGI requests in flight')
+
+    def handle(self, *args, **options):
+        student = CustomUser.objects.filter(is_staff=False, is_superuser=False).first()
+        admin = CustomUser.objects.filter(is_superuser=True).first()
+        if student is None or admin is None:
+            raise CommandError('needs at least one student and one superuser in the database')
+
+        targets = [
+            (student, '/profile/'),
+            (admin, '/adm/'),
+            (admin, '/adm/course-requests/'),
+        ]
+        self.stdout.write(f'{"url":<25} {"wsgi req/s":>12} {"asgi req/s":>12}')
+        # the test clients send Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for user, url in targets:
+                wsgi = self.run_wsgi(user, url, options['requests'])
+                asgi = asyncio.run(self.run_asgi(user, url, options['requests'], options['concurrency']))
+                self.stdout.write(f'{url:<25} {wsgi:>12.1f} {asgi:>12.1f}')
+
+    def run_wsgi(self, user, url, count):
+        client = Client()
+        client.force_login(user)
+        started = time.perf_counter()
+        for _ in range(count):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code} under WSGI')
+        return count / (time.perf_counter() - started)
+
+    async def run_asgi(self, user, url, count, concurrency):
+        with override_settings(ROOT_URLCONF='Student.urls_async'):
+            client = AsyncClient()
+            await client.aforce_login(user)
+            limit = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with limit:
+                    response = await client.get(url)
+                    if response.status_code != 200:
+                        raise CommandError(f'{url} returned {response.status_code} under ASGI')
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(count)))
+            return count / (time.perf_counter() - started)
@@ -0,0 +1,67 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from student_management.auth_backends import invalidate_cached_user
+from student_management.images import ensure_thumbnails, is_processed, store_image
+from student_management.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ("Run profile pictures uploaded before the image pipeline through it: "
+            "resize, strip metadata, dedupe by content hash, make thumbnails. "
+            "Also writes the thumbnails processed pictures are missing.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help='delete the old files once no user points at them')
+
+    def handle(self, *args, **options):
+        converted = {}  # old name -> new name, every old file is processed once
+        users = (
+            CustomUser.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+            .values_list('id', 'profile_picture').iterator(chunk_size=1000)
+        )
+        updated = 0
+        processed = set()  # pictures already through the pipeline, checked for thumbnails below
+        for user_id, old_name in users:
+            if is_processed(old_name):
+                processed.add(old_name)
+                continue
+            if old_name not in converted:
+                try:
+                    with default_storage.open(old_name, 'rb') as original:
+                        converted[old_name] = store_image(original)
+                except (OSError, ValueError) as exc:
+                    self.stderr.write(f'skipping {old_name}: {exc}')
+                    converted[old_name] = None
+            if converted[old_name]:
+                # update(): no need to load / save the whole user row
+                CustomUser.objects.filter(id=user_id).update(
+                    profile_picture=converted[old_name], updated_at=timezone.now(),
+                )
+                invalidate_cached_user(user_id)
+                updated += 1
+
+        new_names = {name for name in converted.values() if name}
+        self.stdout.write(f'{updated} users updated, {len(converted)} files -> {len(new_names)} unique pictures')
+
+        # the page only links thumbnails, it never makes them: new sizes, an identical picture
+        # stored before the thumbnails were, ...
+        thumbnails = 0
+        for name in sorted(processed | new_names):
+            try:
+                thumbnails += ensure_thumbnails(name)
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f'no thumbnails for {name}: {exc}')
+        self.stdout.write(f'{thumbnails} missing thumbnails written')
+
+        if options['delete_originals']:
+            still_used = set(
+                CustomUser.objects.filter(profile_picture__in=list(converted))
+                .values_list('profile_picture', flat=True)
+            )
+            for old_name, new_name in converted.items():
+                if new_name and old_name not in still_used and old_name != new_name:
+                    default_storage.delete(old_name)
+            self.stdout.write('old files deleted')
@@ -0,0 +1,173 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from student_management import reference_data
+from student_management.models import AddOnCourse, CoursePurchaseRequest, CustomUser, Department
+from student_management.roll_numbers import allocate_roll_numbers
+
+
+# Synthetic data at production scale: manage.py seed_scale --students 100000
+#
+# Everything is derived from --seed, so two runs with the same arguments produce the same
+# rows (apart from roll numbers and timestamps). Rows go in with bulk_create in batches,
+# the password is hashed once and shared. Every seeded row is named with --prefix so
+# --flush can remove a previous run.
+#
+# Skew, like real traffic:
+#   - course popularity follows a Zipf curve (a few courses get most requests)
+#   - requests per student are long tailed (most have 0-2, a few have many)
+#   - request states: STATUS_WEIGHTS (mostly approved / completed, a pending tail)
+
+STATUS_WEIGHTS = {'approved': 45, 'completed': 30, 'pending': 15, 'rejected': 10}
+PLACES = ['Kochi', 'Kozhikode', 'Thrissur', 'Kannur', 'Kollam', 'Palakkad', 'Malappuram', 'Alappuzha']
+
+
+class Command(BaseCommand):
+    help = "Generate a large deterministic dataset (departments, students, courses, purchase requests)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=20)
+        parser.add_argument('--students', type=int, default=10000)
+        parser.add_argument('--courses', type=int, default=50)
+        parser.add_argument('--max-requests', type=int, default=12, help='most requests one student can have')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed', help='name prefix of every generated row')
+        parser.add_argument('--password', default='seedpass123', help='password of every seeded user')
+        parser.add_argument('--flush', action='store_true', help='delete rows of an earlier run with this prefix first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        started = time.monotonic()
+
+        if options['flush']:
+            self.flush(prefix)
+        if (CustomUser.objects.filter(username__startswith=f'{prefix}_').exists()
+                or Department.objects.filter(name__startswith=f'{prefix} ').exists()):
+            raise CommandError(f'rows with prefix "{prefix}" already exist, use --flush or another --prefix')
+
+        password = make_password(options['password'])  # hashed once, shared by every seeded user
+        departments = self.seed_departments(prefix, options['departments'])
+        courses = self.seed_courses(prefix, options['courses'])
+        student_ids = self.seed_students(prefix, options['students'], departments, password)
+        requests = self.seed_requests(student_ids, courses, options['max_requests'])
+
+        CustomUser.objects.create_superuser(f'{prefix}_admin', f'{prefix}_admin@example.com', options['password'])
+        # bulk_create sends no signals: drop the cached department / course lists by hand
+        # and recount the analytics summary tables
+        reference_data.bump('departments')
+        reference_data.bump('courses')
+        call_command('rebuild_analytics', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(departments)} departments, {len(courses)} courses, {len(student_ids)} students, '
+            f'{requests} purchase requests in {time.monotonic() - started:.1f}s '
+            f'(admin login: {prefix}_admin / {options["password"]})'
+        ))
+
+    def flush(self, prefix):
+        with transaction.atomic():
+            # requests and purchased courses go with the users (CASCADE)
+            CustomUser.objects.filter(username__startswith=f'{prefix}_').delete()
+            AddOnCourse.objects.filter(course__startswith=f'{prefix} ').delete()
+            Department.objects.filter(name__startswith=f'{prefix} ').delete()
+
+    def seed_departments(self, prefix, count):
+        created = Department.objects.bulk_create(
+            [Department(name=f'{prefix} department {number}') for number in range(1, count + 1)],
+            batch_size=self.batch_size,
+        )
+        return [dept.pk for dept in created]
+
+    def seed_courses(self, prefix, count):
+        created = AddOnCourse.objects.bulk_create(
+            [
+                AddOnCourse(
+                    course=f'{prefix} course {number}',
+                    description=f'Generated add-on course number {number}.',
+                    price=Decimal(self.rng.randrange(500, 20000, 50)),
+                )
+                for number in range(1, count + 1)
+            ],
+            batch_size=self.batch_size,
+        )
+        return [course.pk for course in created]
+
+    def seed_students(self, prefix, count, departments, password):
+        rng = self.rng
+        this_year = date.today().year
+        ids = []
+        for start in range(0, count, self.batch_size):
+            numbers = range(start + 1, min(start + self.batch_size, count) + 1)
+            users = []
+            for number, roll_number in zip(numbers, allocate_roll_numbers(len(numbers))):
+                age = rng.randint(18, 30)
+                users.append(CustomUser(
+                    username=f'{prefix}_{number}',
+                    email=f'{prefix}_{number}@example.com',
+                    password=password,
+                    roll_number=roll_number,
+                    department_id=rng.choice(departments) if departments else None,
+                    gender=rng.choice(('Male', 'Female')),
+                    age=age,
+                    date_of_birth=date(this_year - age, rng.randint(1, 12), rng.randint(1, 28)),
+                    year_of_admission=this_year - rng.randint(0, 4),
+                    place=rng.choice(PLACES),
+                    phone=f'9{rng.randrange(10 ** 9):09d}',
+                ))
+            with transaction.atomic():
+                ids.extend(user.pk for user in CustomUser.objects.bulk_create(users))
+            self.stdout.write(f'students: {len(ids)}/{count}')
+        return ids
+
+    def seed_requests(self, student_ids, courses, max_requests):
+        if not courses:
+            return 0
+        rng = self.rng
+        course_weights = [1 / rank for rank in range(1, len(courses) + 1)]  # Zipf popularity
+        statuses, status_weights = zip(*STATUS_WEIGHTS.items())
+        limit = min(max_requests, len(courses))
+        now = timezone.now()
+        Purchased = CustomUser.purchased_courses.through
+
+        requests, purchased, total = [], [], 0
+        for student_id in student_ids:
+            wanted = min(limit, int(rng.paretovariate(1.5)) - 1)  # long tail, most students 0-2
+            chosen = set()
+            while len(chosen) < wanted:
+                chosen.add(rng.choices(courses, course_weights)[0])
+            for course_id in chosen:
+                status = rng.choices(statuses, status_weights)[0]
+                approved_at = completed_at = None
+                if status in ('approved', 'completed'):
+                    approved_at = now - timedelta(days=rng.randint(1, 365))
+                    purchased.append(Purchased(customuser_id=student_id, addoncourse_id=course_id))
+                if status == 'completed':
+                    completed_at = approved_at + timedelta(days=rng.randint(1, 90))
+                requests.append(CoursePurchaseRequest(
+                    student_id=student_id, course_id=course_id, status=status,
+                    approved_at=approved_at, completed_at=completed_at,
+                ))
+            if len(requests) >= self.batch_size:
+                total += self.flush_requests(requests, purchased)
+        total += self.flush_requests(requests, purchased)
+        return total
+
+    def flush_requests(self, requests, purchased):
+        count = len(requests)
+        with transaction.atomic():
+            CoursePurchaseRequest.objects.bulk_create(requests, batch_size=self.batch_size)
+            CustomUser.purchased_courses.through.objects.bulk_create(purchased, batch_size=self.batch_size)
+        requests.clear()
+        purchased.clear()
+        return count
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from student_management.mail import deliver_batch
+
+
+class Command(BaseCommand):
+    help = "Send queued emails from the outbox (runs forever unless --once)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=None,
+                            help='attempts before an email is dead-lettered (default OUTBOX_MAX_ATTEMPTS)')
+        parser.add_argument('--sleep', type=float, default=5.0,
+                            help='seconds to wait when the outbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='drain what is due now and exit')
+        parser.add_argument('--backend', default=None,
+                            help='email backend to deliver with, e.g. '
+                                 'django.core.mail.backends.console.EmailBackend (default EMAIL_BACKEND)')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = deliver_batch(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                backend=options['backend'],
+            )
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f'sent {sent}, failed {failed}')
+                continue  # there may be more due right away
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'done: sent {total_sent}, failed {total_failed}'))
@@ -0,0 +1,154 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .images import THUMBNAIL_DIR, UPLOAD_DIR, thumbnail_stem
+
+
+# Uploaded files (profile pictures + thumbnails) under MEDIA_URL, served by media_view.
+#
+# Django only checks access and stats the file. The bytes go out one of three ways:
+#   MEDIA_ACCEL_REDIRECT = '/protected-media/'  nginx sends the file (X-Accel-Redirect), with
+#                                               location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+#   MEDIA_X_SENDFILE = True                     Apache mod_xsendfile / lighttpd (X-Sendfile)
+#   neither                                     FileResponse (wsgi.file_wrapper -> sendfile where the
+#                                               server has it), Range requests streamed in chunks
+# ETag / Last-Modified come from the stat, so If-None-Match / If-Modified-Since get a 304
+# before anything is opened.
+#
+# Who sees what: staff every file, a student only their own picture and its thumbnails.
+# Pictures are stored under their content hash (images.py), so the name says whose it is.
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+THUMBNAIL_SUFFIX_RE = re.compile(r'_\d+$')  # <stem>_<ext>_<size>.webp
+CHUNK_SIZE = 64 * 1024
+
+
+def picture_stem(name):
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def can_view(user, name):
+    if not user.is_authenticated:
+        return False
+    if user.is_staff or user.is_superuser:
+        return True
+    own = user.profile_picture.name if user.profile_picture else ''
+    if not own:
+        return False
+    if name == own:
+        return True
+    if name.startswith(THUMBNAIL_DIR + '/'):
+        return THUMBNAIL_SUFFIX_RE.sub('', picture_stem(name)) == thumbnail_stem(own)
+    return False
+
+
+def find_file(name):
+    """(normalized name, absolute path, stat) of a file under MEDIA_ROOT, Http404 otherwise."""
+    if not name.startswith(UPLOAD_DIR + '/'):
+        raise Http404
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(path):
+        raise Http404
+    return os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/'), path, stat
+
+
+def file_etag(stat):
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+def parse_range(header, size):
+    """(start, end) inclusive of a single `bytes=` range, None to send everything, 'invalid' for a 416."""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None  # several ranges / other units: a 200 with the whole file is allowed
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1  # bytes=-500: the last 500
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as media_file:
+        media_file.seek(start)
+        while length > 0:
+            chunk = media_file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def offload_response(name, path, content_type):
+    """Empty response telling the front-end server which file to send, None when not set up."""
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT', '')
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + name
+        return response
+    if getattr(settings, 'MEDIA_X_SENDFILE', False):
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+    return None
+
+
+def file_response(request, path, stat, etag, content_type):
+    size = stat.st_size
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and request.method in ('GET', 'HEAD') and (if_range is None or if_range == etag):
+        byte_range = parse_range(range_header, size)
+    if byte_range == 'invalid':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        del response['Content-Disposition']
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(read_range(path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_media(request, name):
+    name, path, stat = find_file(name)
+    if not can_view(request.user, name):
+        raise Http404  # same answer as a missing file, so names can't be probed
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = offload_response(name, path, content_type) or file_response(request, path, stat, etag, content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = f'private, max-age={getattr(settings, "MEDIA_MAX_AGE", 3600)}'
+    return response
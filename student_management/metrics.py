@@ -0,0 +1,287 @@
+import atexit
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+# Per-view request metrics, served in Prometheus text format at /adm/metrics/.
+#
+# MetricsMiddleware (middleware.py) times every request and, per resolved URL name, adds up:
+# latency histogram, status codes, DB queries + time, template render time
+# (TimedDjangoTemplates, the TEMPLATES backend) and response bytes.
+# Queries are counted by count_query, an execute wrapper put on every connection when it
+# opens (connection_created, signals.py). It charges the request found in a context variable,
+# so queries from sync_to_async threads (they copy the context) count too. A streamed body
+# (StreamingHttpResponse) runs its queries after the middleware returned: the body is wrapped
+# and the request recorded once it has been sent. Latency is always time to the response.
+#
+# Every worker process keeps its numbers in memory and writes them to its own file,
+# METRICS_DIR/<pid>.json, at most every METRICS_FLUSH_SECONDS (and at exit). The endpoint
+# adds up all files, so it shows the whole server whichever worker answers. Like the
+# prometheus_client multiprocess mode, empty METRICS_DIR when the server (re)starts.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UNRESOLVED = '<unresolved>'  # 404s and anything outside the urlconf, keeps label count bounded
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None) or os.path.join(tempfile.gettempdir(), 'student_metrics')
+
+
+def new_view_stats():
+    return {
+        'requests': {},  # status code -> count
+        'buckets': [0] * (len(LATENCY_BUCKETS) + 1),  # last one is +Inf
+        'latency_sum': 0.0,
+        'queries': 0,
+        'db_seconds': 0.0,
+        'template_seconds': 0.0,
+        'response_bytes': 0,
+    }
+
+
+class MetricsStore:
+    """This process' aggregates, flushed to METRICS_DIR/<pid>.json."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.pid = os.getpid()
+        self.last_flush = time.monotonic()
+
+    def record(self, view, status, latency, queries, db_seconds, template_seconds, size):
+        with self.lock:
+            if self.pid != os.getpid():
+                # forked worker: start from zero, the parent's numbers are in the parent's file
+                self.views, self.pid = {}, os.getpid()
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = new_view_stats()
+            status = str(status)
+            stats['requests'][status] = stats['requests'].get(status, 0) + 1
+            stats['buckets'][bisect_left(LATENCY_BUCKETS, latency)] += 1
+            stats['latency_sum'] += latency
+            stats['queries'] += queries
+            stats['db_seconds'] += db_seconds
+            stats['template_seconds'] += template_seconds
+            stats['response_bytes'] += size
+        if time.monotonic() - self.last_flush >= getattr(settings, 'METRICS_FLUSH_SECONDS', 5):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.views or self.pid != os.getpid():
+                return
+            data = json.dumps(self.views)
+            self.last_flush = time.monotonic()
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{self.pid}.json')
+        # write + rename, so a reader never sees half a file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{self.pid}.')
+        with os.fdopen(fd, 'w') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+
+
+store = MetricsStore()
+atexit.register(store.flush)
+
+
+def collect():
+    """Aggregates of every process: {view: stats}."""
+    store.flush()
+    total = {}
+    directory = metrics_dir()
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith('.json')]
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        try:
+            with open(os.path.join(directory, name)) as metrics_file:
+                views = json.load(metrics_file)
+        except (OSError, ValueError):
+            continue  # being replaced right now / not ours
+        for view, stats in views.items():
+            merged = total.setdefault(view, new_view_stats())
+            for status, count in stats['requests'].items():
+                merged['requests'][status] = merged['requests'].get(status, 0) + count
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], stats['buckets'])]
+            for key in ('latency_sum', 'queries', 'db_seconds', 'template_seconds', 'response_bytes'):
+                merged[key] += stats[key]
+    return total
+
+
+def label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(views):
+    lines = []
+
+    def header(name, kind, text):
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    header('django_view_requests_total', 'counter', 'Requests per view and status code.')
+    for view, stats in sorted(views.items()):
+        for status, count in sorted(stats['requests'].items()):
+            lines.append(f'django_view_requests_total{{view="{label(view)}",status="{status}"}} {count}')
+
+    header('django_view_latency_seconds', 'histogram', 'Request latency per view.')
+    for view, stats in sorted(views.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats['buckets']):
+            cumulative += count
+            lines.append(f'django_view_latency_seconds_bucket{{view="{label(view)}",le="{bound}"}} {cumulative}')
+        lines.append(f'django_view_latency_seconds_sum{{view="{label(view)}"}} {stats["latency_sum"]:.6f}')
+        lines.append(f'django_view_latency_seconds_count{{view="{label(view)}"}} {cumulative}')
+
+    totals = (
+        ('django_view_db_queries_total', 'queries', 'Database queries run by the view.'),
+        ('django_view_db_seconds_total', 'db_seconds', 'Time spent in database queries.'),
+        ('django_view_template_seconds_total', 'template_seconds', 'Time spent rendering templates.'),
+        ('django_view_response_bytes_total', 'response_bytes', 'Response body bytes.'),
+    )
+    for name, key, text in totals:
+        header(name, 'counter', text)
+        for view, stats in sorted(views.items()):
+            value = stats[key]
+            value = f'{value:.6f}' if isinstance(value, float) else value
+            lines.append(f'{name}{{view="{label(view)}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """Counters of the request in progress, reached through a context variable."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+
+    def activate(self):
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+    def measure_stream(self, content, done):
+        """Streamed body that counts its queries here and calls done(bytes sent) at the end."""
+        if hasattr(content, '__aiter__'):
+            return self._ameasure_stream(content, done)
+        return self._measure_stream(content, done)
+
+    def _measure_stream(self, content, done):
+        iterator = iter(content)
+        size = 0
+        try:
+            while True:
+                token = self.activate()  # only around next(): between chunks it's the server's context
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    self.deactivate(token)
+                size += len(chunk)
+                yield chunk
+        finally:
+            done(size)
+
+    async def _ameasure_stream(self, content, done):
+        iterator = aiter(content)
+        size = 0
+        try:
+            while True:
+                token = self.activate()
+                try:
+                    chunk = await anext(iterator)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    self.deactivate(token)
+                size += len(chunk)
+                yield chunk
+        finally:
+            done(size)
+
+
+def count_query(execute, sql, params, many, context):
+    # execute wrapper of every connection, charges the request in progress (if any)
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_counter(connection):
+    if count_query not in connection.execute_wrappers:  # connection_created fires on every reconnect
+        connection.execute_wrappers.append(count_query)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED
+    return match.view_name or UNRESOLVED
+
+
+def server_timing(metrics, total_seconds):
+    return (
+        f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.queries} queries", '
+        f'tpl;dur={metrics.template_seconds * 1000:.1f}, '
+        f'total;dur={total_seconds * 1000:.1f}'
+    )
+
+
+def response_size(response):
+    if response.streaming:
+        return int(response.get('Content-Length') or 0)  # not read here, that would consume it
+    return len(response.content)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics = _current.get()
+            if metrics is not None:
+                metrics.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The normal Django template backend, with render() timed for the request metrics."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -1,29 +1,258 @@
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.exceptions import MiddlewareNotUsed
 from django.shortcuts import redirect
-from django.contrib import messages
+
+from .metrics import RequestMetrics, response_size, server_timing, view_name
+from .metrics import store as metrics_store
+from .replicas import pin_to_primary, replica_aliases, stop_tracking, track_writes
+from .static_assets import build_index as build_static_index, serve as serve_static
+
+# Keeps admins on the admin side (/adm/) and students off it.
+#
+# Paths are sorted into kinds once, by one precompiled regex:
+#   ASSET  /static/ /media/       -> passed straight through, user never resolved
+#   OPEN   exactly / and /logout/ -> allowed for everyone, user never resolved
+#   ADMIN  /adm/...               -> admins only
+#   STUDENT everything else       -> students / anonymous only
+# The role comes from a small claim in the session (set at login), so checking it needs
+# no CustomUser query. The claim is re-checked against the user row every
+# ROLE_CLAIM_MAX_AGE seconds so a changed is_staff / is_superuser is picked up.
+
+ASSET, OPEN, ADMIN, STUDENT = 'asset', 'open', 'admin', 'student'
+
+ROLE_SESSION_KEY = '_role'
+
+# URLs to allow admins on student side
+ALLOWED_FOR_ADMIN = ('/logout/', '/')
+
+
+def role_for(user):
+    return 'admin' if (user.is_staff or user.is_superuser) else 'student'
+
+
+def remember_role(session, user):
+    session[ROLE_SESSION_KEY] = [role_for(user), str(user.pk), int(time.time())]
+
+
+def build_path_pattern():
+    def prefix(url):
+        url = url or ''
+        if not url.startswith('/'):
+            url = '/' + url
+        return re.escape(url if url.endswith('/') else url + '/')
+
+    asset_prefixes = '|'.join(prefix(url) for url in (settings.STATIC_URL, settings.MEDIA_URL) if url)
+    return re.compile(rf'(?P<asset>{asset_prefixes})|(?P<admin>/adm/)')
+
 
 class BlockAccessMiddleware:
+    # works in both stacks, so under ASGI the async views are not pushed back onto threads
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # built once per process, not per request
+        self.path_pattern = build_path_pattern()
+        self.open_paths = frozenset(ALLOWED_FOR_ADMIN)
+        self.claim_max_age = getattr(settings, 'ROLE_CLAIM_MAX_AGE', 300)
 
-    def __call__(self, request):
-        if not request.user.is_authenticated:
-            return self.get_response(request)
+    def classify(self, path):
+        if path in self.open_paths:
+            return OPEN
+        match = self.path_pattern.match(path)
+        if match is None:
+            return STUDENT
+        return ASSET if match.lastgroup == 'asset' else ADMIN
+
+    def get_role(self, request):
+        session = request.session
+        user_id = session.get(SESSION_KEY)
+        if user_id is None:
+            return None  # anonymous, nothing to look up
+        claim = session.get(ROLE_SESSION_KEY)
+        if self.claim_is_fresh(claim, user_id):
+            return claim[0]
+        # no / stale claim (older session or role may have changed): read the user once
+        user = request.user
+        if not user.is_authenticated:
+            return None
+        remember_role(session, user)
+        return role_for(user)
 
-        path = request.path
+    async def aget_role(self, request):
+        session = request.session
+        user_id = await session.aget(SESSION_KEY)
+        if user_id is None:
+            return None
+        claim = await session.aget(ROLE_SESSION_KEY)
+        if self.claim_is_fresh(claim, user_id):
+            return claim[0]
+        user = await request.auser()
+        if not user.is_authenticated:
+            return None
+        await session.aset(ROLE_SESSION_KEY, [role_for(user), str(user.pk), int(time.time())])
+        return role_for(user)
 
-        # URLs to allow admins on student side
-        allowed_for_admin = ['/logout/', '/']  # add other public student URLs if needed
+    def claim_is_fresh(self, claim, user_id):
+        return bool(claim) and claim[1] == str(user_id) and time.time() - claim[2] < self.claim_max_age
 
+    def check(self, kind, role):
         # Admin block to access student pages
-        if (request.user.is_staff or request.user.is_superuser) and not path.startswith('/adm/'):
-            if path not in allowed_for_admin:
-                return redirect('/adm/')
+        if role == 'admin' and kind == STUDENT:
+            return redirect('/adm/')
 
         # Student bloc to access admin pages
-        if not (request.user.is_staff or request.user.is_superuser) and path.startswith('/adm/'):
+        if role == 'student' and kind == ADMIN:
             return redirect('/')  # Redirect to student home
+        return None
 
-        return self.get_response(request)
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        kind = self.classify(request.path)
+        if kind in (ASSET, OPEN):
+            return self.get_response(request)
+        return self.check(kind, self.get_role(request)) or self.get_response(request)
+
+    async def __acall__(self, request):
+        kind = self.classify(request.path)
+        if kind in (ASSET, OPEN):
+            return await self.get_response(request)
+        return self.check(kind, await self.aget_role(request)) or await self.get_response(request)
+
+
+class ReplicaPinMiddleware:
+    # after a write (a POST, or any request that wrote rows) the browser reads from the
+    # primary for REPLICA_PIN_SECONDS, see replicas.py
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.enabled = bool(replica_aliases())  # nothing to pin to without replicas
+
+    def pin(self, request, response, writes):
+        if writes['wrote'] or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            pin_to_primary(response)
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        writes, token = track_writes()
+        try:
+            return self.pin(request, self.get_response(request), writes)
+        finally:
+            stop_tracking(token)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        writes, token = track_writes()
+        try:
+            return self.pin(request, await self.get_response(request), writes)
+        finally:
+            stop_tracking(token)
 
 
+class MetricsMiddleware:
+    # per-view latency / queries / template time / bytes, see metrics.py. First in
+    # MIDDLEWARE so the latency includes the rest of the stack.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = metrics.activate()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = metrics.activate()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    def finish(self, request, response, metrics, elapsed):
+        response['Server-Timing'] = server_timing(metrics, elapsed)  # so far, headers go out first
+        view, status = view_name(request), response.status_code
+
+        def record(size):
+            metrics_store.record(
+                view, status, elapsed, metrics.queries, metrics.db_seconds, metrics.template_seconds, size,
+            )
+
+        if response.streaming and getattr(response, 'file_to_stream', None) is None:
+            # generator body (not a FileResponse, which has to stay a file for sendfile)
+            response.streaming_content = metrics.measure_stream(response.streaming_content, record)
+        else:
+            record(response_size(response))
+        return response
+
+
+class StaticFilesMiddleware:
+    # serves collectstatic's output (hashed, precompressed, immutable), see static_assets.py.
+    # Right after SecurityMiddleware: a static request skips sessions, auth and the views.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.DEBUG or not getattr(settings, 'SERVE_STATIC', False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed  # runserver serves static files itself while DEBUG
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.files = None  # indexed on first use, collectstatic has to run before the server
+
+    def find(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        if self.files is None:
+            self.files = build_static_index(settings.STATIC_ROOT)
+        return self.files.get(request.path[len(self.prefix):])
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        static_file = self.find(request)
+        if static_file is not None:
+            return serve_static(request, static_file)
+        return self.get_response(request)
 
+    async def __acall__(self, request):
+        static_file = self.find(request)
+        if static_file is not None:
+            return serve_static(request, static_file)
+        return await self.get_response(request)
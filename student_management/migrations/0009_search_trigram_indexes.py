@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+# Indexes for admin_panel.search. PostgreSQL only, other databases skip this.
+# icontains compiles to UPPER(col::text) LIKE UPPER(...) so the trigram indexes
+# are built on that same expression; iexact (full email fast path) uses the btree one.
+
+INDEXES = [
+    ('customuser_username_trgm',
+     'CREATE INDEX CONCURRENTLY IF NOT EXISTS customuser_username_trgm '
+     'ON student_management_customuser USING gin (UPPER(username::text) gin_trgm_ops)'),
+    ('customuser_email_trgm',
+     'CREATE INDEX CONCURRENTLY IF NOT EXISTS customuser_email_trgm '
+     'ON student_management_customuser USING gin (UPPER(email::text) gin_trgm_ops)'),
+    ('customuser_email_upper',
+     'CREATE INDEX CONCURRENTLY IF NOT EXISTS customuser_email_upper '
+     'ON student_management_customuser (UPPER(email::text))'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, sql in INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, sql in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False  # CREATE INDEX CONCURRENTLY can't run inside a transaction
+
+    dependencies = [
+        ('student_management', '0008_alter_customuser_age'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
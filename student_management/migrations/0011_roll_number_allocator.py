@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:58
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+# start numbering after the highest roll number already given out (or 100 on a fresh db)
+def seed_allocator(apps, schema_editor):
+    CustomUser = apps.get_model('student_management', 'CustomUser')
+    RollNumberCounter = apps.get_model('student_management', 'RollNumberCounter')
+    highest = CustomUser.objects.aggregate(m=Max('roll_number'))['m']
+    start = highest + 1 if highest else 100
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE SEQUENCE IF NOT EXISTS student_roll_number_seq START WITH {int(start)}'
+        )
+    else:
+        RollNumberCounter.objects.update_or_create(name='roll_number', defaults={'next_value': start})
+
+
+def drop_allocator(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE IF EXISTS student_roll_number_seq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_management', '0010_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('next_value', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(seed_allocator, drop_allocator),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_management', '0011_roll_number_allocator'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coursepurchaserequest',
+            index=models.Index(fields=['student', 'status'], name='purchase_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursepurchaserequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['course'], name='purchase_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['gender', 'roll_number'], name='user_gender_roll_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:19
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # the constraint cannot be created while two accounts share an email (in any case),
+    # list them so they can be fixed by hand instead of failing with a bare IntegrityError
+    CustomUser = apps.get_model('student_management', 'CustomUser')
+    duplicates = list(
+        CustomUser.objects.using(schema_editor.connection.alias)
+        .exclude(email='')
+        .values(email_lower=Lower('email'))
+        .annotate(accounts=Count('id'))
+        .filter(accounts__gt=1)
+        .values_list('email_lower', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            'These emails are used by more than one account, fix them before migrating: '
+            + ', '.join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_management', '0012_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='user_email_ci_unique', violation_error_message='This email is already in use.'),
+        ),
+    ]
@@ -1,7 +1,13 @@
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models.functions import Lower
+from django.dispatch import Signal
 from django.contrib.auth.models import AbstractUser
 from datetime import date
+from django.utils import timezone
 from django.core.validators import MinValueValidator
+from .roll_numbers import allocate_roll_number, reserve_roll_number
+from .roll_numbers import allocator as roll_number_allocator
+from .images import store_profile_picture
 
 # Department model
 class Department(models.Model):
@@ -11,7 +17,18 @@ class Department(models.Model):
         return self.name
 
 
+ROLL_NUMBER_ATTEMPTS = 3
+
+
 # Custom user model
+def track_loaded(tracked, field_names, values):
+    """The `tracked` attnames out of a from_db() row (None if one of them was deferred)."""
+    loaded = dict(zip(field_names, values))
+    if not all(name in loaded for name in tracked):
+        return None
+    return {name: loaded[name] for name in tracked}
+
+
 class CustomUser(AbstractUser):
     #extra fields
     STATUS_CHOICES = (
@@ -27,18 +44,82 @@ class CustomUser(AbstractUser):
     date_of_birth = models.DateField(default=date(2000,1,1))  
     profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
     gender = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Male')
+    updated_at = models.DateTimeField(auto_now=True)  # cache version of the row (admin student list)
 
     #cource purchasing 
     purchased_courses = models.ManyToManyField("AddOnCourse", related_name="students", blank=True) # a student can purchase many course
     # Default flags
     is_staff = models.BooleanField(default=False)       # Students are not staff they cant get into admin
     is_superuser = models.BooleanField(default=False)   # Only superuser manually set
-    
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # std_view gender filter, already in roll number order
+            models.Index(fields=['gender', 'roll_number'], name='user_gender_roll_idx'),
+        ]
+        constraints = [
+            # one account per email whatever the case; blank emails (createsuperuser) are allowed
+            models.UniqueConstraint(
+                Lower('email'), condition=~models.Q(email=''), name='user_email_ci_unique',
+                violation_error_message='This email is already in use.',
+            ),
+        ]
+
+    # values as loaded from the database, post_save receivers (and save() for roll_number)
+    # compare them with the new ones
+    TRACKED_FIELDS = ('department_id', 'is_staff', 'is_superuser', 'roll_number')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = track_loaded(cls.TRACKED_FIELDS, field_names, values)
+        return instance
+
     def save(self, *args, **kwargs):
-        if not self.roll_number:
-            last_user = CustomUser.objects.order_by('-roll_number').first()
-            self.roll_number = last_user.roll_number + 1 if last_user else 100  # if last user exist give roll+1 or 100
-        super().save(*args, **kwargs)
+        if self.profile_picture and not getattr(self.profile_picture, '_committed', True):
+            # new upload: resize, strip metadata, dedupe by hash, make thumbnails (images.py)
+            store_profile_picture(self.profile_picture)
+        if self.roll_number:
+            loaded = getattr(self, '_loaded_values', None)
+            if loaded is None or loaded.get('roll_number') != self.roll_number:
+                # set by hand (admin form): the allocator must never hand this number out
+                reserve_roll_number(self.roll_number)
+            super().save(*args, **kwargs)
+            self.remember_saved_values(kwargs.get('update_fields'))
+            return
+        # from a sequence / locked counter, see roll_numbers.py (no max()+1 race); a number that
+        # was typed in by hand before this process reserved its block is skipped
+        for attempt in range(ROLL_NUMBER_ATTEMPTS):
+            self.roll_number = allocate_roll_number()
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                self.remember_saved_values(kwargs.get('update_fields'))
+                return
+            except IntegrityError:
+                taken = CustomUser.objects.filter(roll_number=self.roll_number).exists()
+                self.roll_number = 0
+                if not taken or attempt == ROLL_NUMBER_ATTEMPTS - 1:
+                    raise  # another unique field, or the counter keeps colliding
+                roll_number_allocator.reset()  # the rest of the block may be taken too
+
+    def remember_saved_values(self, update_fields=None):
+        # the row now holds these, so saving again doesn't count as a roll number set by hand
+        loaded = dict(getattr(self, '_loaded_values', None) or {})
+        for name in self.TRACKED_FIELDS:
+            field = self._meta.get_field(name)
+            if update_fields is None or field.name in update_fields or field.attname in update_fields:
+                loaded[name] = getattr(self, name)
+        self._loaded_values = loaded
+
+
+# fallback roll number counter for databases without sequences (PostgreSQL uses a sequence)
+class RollNumberCounter(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
 
 
 class AddOnCourse(models.Model):
@@ -49,6 +130,107 @@ class AddOnCourse(models.Model):
     def __str__(self):
         return self.course
 
+def invalidate_profiles_on_commit(student_ids):
+    # queryset.update() sends no signals, so drop the cached profiles ourselves (profile_cache.py)
+    from .profile_cache import invalidate_profile
+    if student_ids:
+        transaction.on_commit(lambda: invalidate_profile(*student_ids))
+
+
+# queryset.update() sends no post_save: transition() sends this instead, with the
+# changed rows (dicts with at least course_id and student_id) and the old / new status
+purchase_requests_bulk_updated = Signal()
+
+
+class CoursePurchaseRequestQuerySet(models.QuerySet):
+    """Set based status changes, a fixed number of queries no matter how many rows."""
+
+    def transition(self, from_status, to_status, **changes):
+        """
+        Move every request of this queryset that is in `from_status` to `to_status` (plus
+        `changes`, e.g. approved_at) in ONE conditional statement:
+            UPDATE ... SET status = to_status, ... WHERE id IN (<this queryset>) AND status = from_status
+            RETURNING id, student_id, course_id
+        Returns the rows this call moved as dicts (id, student_id, course_id). A row that is
+        gone or was moved by a concurrent request is simply not in the list, so two admins
+        clicking at once get one winner. Caches and the analytics counters are updated through
+        purchase_requests_bulk_updated, as queryset.update() sends no post_save.
+        """
+        using = self._db or router.db_for_write(self.model)
+        connection = connections[using]
+        opts = self.model._meta
+        quote = connection.ops.quote_name
+        changes = {'status': to_status, 'updated_at': timezone.now(), **changes}
+
+        assignments, params = [], []
+        for name, value in changes.items():
+            field = opts.get_field(name)
+            assignments.append(f'{quote(field.column)} = %s')
+            params.append(field.get_db_prep_save(value, connection))
+        matching, matching_params = self.order_by().values('pk').query.get_compiler(using).as_sql()
+        returned = [opts.pk, opts.get_field('student'), opts.get_field('course')]
+        status_column = quote(opts.get_field('status').column)
+
+        with transaction.atomic(using=using):
+            if connection.features.can_return_columns_from_insert:  # RETURNING: PostgreSQL, SQLite >= 3.35
+                sql = (
+                    f'UPDATE {quote(opts.db_table)} SET {", ".join(assignments)} '
+                    f'WHERE {quote(opts.pk.column)} IN ({matching}) AND {status_column} = %s '
+                    f'RETURNING {", ".join(quote(field.column) for field in returned)}'
+                )
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, (*params, *matching_params, from_status))
+                    moved = cursor.fetchall()
+            else:
+                # no RETURNING: lock the rows in from_status, then update exactly those
+                moved = list(
+                    self.filter(status=from_status).select_for_update()
+                    .values_list('id', 'student_id', 'course_id')
+                )
+                CoursePurchaseRequest.objects.using(using).filter(
+                    id__in=[row[0] for row in moved], status=from_status,
+                ).update(**changes)
+            rows = [{'id': pk, 'student_id': student_id, 'course_id': course_id} for pk, student_id, course_id in moved]
+            if rows:
+                invalidate_profiles_on_commit({row['student_id'] for row in rows})
+                purchase_requests_bulk_updated.send(
+                    sender=CoursePurchaseRequest, rows=rows, old_status=from_status, new_status=to_status,
+                )
+        return rows
+
+    def bulk_approve(self):
+        """
+        Approve every pending request in this queryset and grant the courses.
+        Returns the approved rows as dicts (id, student_id, course_id, username, email, course name)
+        so the caller can notify without loading them again. Run it inside transaction.atomic().
+        """
+        rows = self.transition('pending', 'approved', approved_at=timezone.now())
+        if not rows:
+            return []
+        grant_courses(rows)
+        names = {
+            row['id']: row for row in
+            CoursePurchaseRequest.objects.filter(id__in=[row['id'] for row in rows])
+            .values('id', 'student__username', 'student__email', 'course__course')
+        }
+        for row in rows:
+            row.update(names[row['id']])
+        return rows
+
+    def bulk_reject(self):
+        """Reject every pending request in this queryset, returns the rejected rows (id, student_id, course_id)."""
+        return self.transition('pending', 'rejected')
+
+
+def grant_courses(rows):
+    """Add the requested courses to the students' purchased_courses, rows: dicts with student_id, course_id."""
+    Through = CustomUser.purchased_courses.through
+    Through.objects.bulk_create(
+        [Through(customuser_id=row['student_id'], addoncourse_id=row['course_id']) for row in rows],
+        ignore_conflicts=True,  # course already granted
+    )
+
+
 class CoursePurchaseRequest(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -63,10 +245,87 @@ class CoursePurchaseRequest(models.Model):
     requested_at = models.DateTimeField(auto_now_add=True)
     approved_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)  # set by hand in update() calls, auto_now skips them
+
+    objects = CoursePurchaseRequestQuerySet.as_manager()
+
+    TRACKED_FIELDS = ('course_id', 'status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = track_loaded(cls.TRACKED_FIELDS, field_names, values)
+        return instance
+
+    # state transitions: one conditional UPDATE each (see CoursePurchaseRequestQuerySet.transition),
+    # True if this call made the move, False if the request had already left from_status
+
+    def move(self, from_status, to_status, **changes):
+        changes['updated_at'] = timezone.now()
+        rows = CoursePurchaseRequest.objects.filter(pk=self.pk).transition(from_status, to_status, **changes)
+        if not rows:
+            return False
+        self.status = to_status
+        for name, value in changes.items():
+            setattr(self, name, value)
+        self._loaded_values = {'course_id': self.course_id, 'status': to_status}
+        return True
+
+    def approve(self):
+        """pending -> approved, and the course is granted in the same transaction."""
+        with transaction.atomic():
+            if not self.move('pending', 'approved', approved_at=timezone.now()):
+                return False
+            grant_courses([{'student_id': self.student_id, 'course_id': self.course_id}])
+        return True
+
+    def reject(self):
+        """pending -> rejected."""
+        return self.move('pending', 'rejected')
+
+    def complete(self):
+        """approved (in progress) -> completed."""
+        return self.move('approved', 'completed', completed_at=timezone.now())
 
     class Meta:
         unique_together = ('student', 'course')  # avoid duplicate pending requests
+        indexes = [
+            # a student's requests in one state (profile, mark completed)
+            models.Index(fields=['student', 'status'], name='purchase_student_status_idx'),
+            # the admin queue only ever looks at pending rows, a small slice of the table
+            models.Index(fields=['course'], condition=models.Q(status='pending'), name='purchase_pending_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} -> {self.course.title} ({self.status})"
     
+
+# Outgoing emails are written here (same transaction as the view) and sent later by
+# `manage.py send_outbox`, so SMTP being slow or down never breaks a request.
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),  # claimed by a send_outbox worker until next_attempt_at (mail.py)
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),  # gave up after max attempts
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField(default=list)  # list of recipient addresses
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
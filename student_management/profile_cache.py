@@ -0,0 +1,74 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import CoursePurchaseRequest
+from .reference_data import current_version
+
+
+# Cached data for profile_view, one entry per user.
+# Built with ONE query (requests JOIN course) + one for the purchased course ids,
+# then grouped by status in Python. Dropped by the signals in signals.py whenever the
+# user's row, their purchase requests or their purchased courses change.
+# Code that changes rows with queryset.update() (no signals) must call invalidate_profile().
+# The payload holds the course objects, so its key carries the courses version of
+# reference_data: renaming or repricing a course moves every user to a new key (the old
+# entries are never read again and expire).
+# profile_version() is a token that changes with every invalidation (ETag of profile_view).
+
+def profile_cache_key(user_id):
+    return f'profile:{user_id}:{current_version("courses")}'
+
+
+def profile_version_key(user_id):
+    return f'profile:{user_id}:version'
+
+
+def build_profile_payload(user):
+    requests = list(
+        CoursePurchaseRequest.objects
+        .using(DEFAULT_DB_ALIAS)  # cached for everyone, never from a lagging replica
+        .filter(student_id=user.pk)
+        .select_related('course')
+        .order_by('id')
+    )
+    by_status = {status: [] for status, _ in CoursePurchaseRequest.STATUS_CHOICES}
+    for req in requests:
+        by_status.setdefault(req.status, []).append(req)
+    return {
+        'all_requests': requests,
+        'pending_requests': by_status['pending'],
+        'approved_requests': by_status['approved'],
+        'completed_requests': by_status['completed'],
+        'rejected_requests': by_status['rejected'],
+        'pending_course_ids': {req.course_id for req in by_status['pending']},
+        'purchased_course_ids': set(user.purchased_courses.using(DEFAULT_DB_ALIAS).values_list('id', flat=True)),
+    }
+
+
+def get_profile_payload(user):
+    key = profile_cache_key(user.pk)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_profile_payload(user)
+        cache.set(key, payload, getattr(settings, 'PROFILE_CACHE_TIMEOUT', 300))
+    return payload
+
+
+def profile_version(user_id):
+    key = profile_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # first use, evicted or invalidated: a new random token never matches an old ETag
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key) or uuid.uuid4().hex
+    return version
+
+
+def invalidate_profile(*user_ids):
+    cache.delete_many(
+        [profile_cache_key(user_id) for user_id in user_ids]
+        + [profile_version_key(user_id) for user_id in user_ids]
+    )
@@ -0,0 +1,80 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import AddOnCourse, Department
+
+
+# Cache for reference data that is read everywhere and changes rarely (departments, courses).
+#
+# Two levels:
+#   - a per-process memo {name: (version, rows)}
+#   - Django's cache (shared between processes when CACHES points at redis/memcached)
+# Each data set has a version token in the cache. Reads compare the memo's version with it,
+# so a warm read costs one cache get and zero queries. save/delete signals (signals.py)
+# replace the token after the transaction commits, which makes every process reload.
+
+LOADERS = {
+    # always from the primary: a lagging replica would cache stale rows for everyone
+    'departments': lambda: list(Department.objects.using(DEFAULT_DB_ALIAS).order_by('id')),
+    'courses': lambda: list(AddOnCourse.objects.using(DEFAULT_DB_ALIAS).order_by('id')),
+}
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def version_key(name):
+    return f'refdata:{name}:version'
+
+
+def data_key(name, version):
+    return f'refdata:{name}:{version}'
+
+
+def current_version(name):
+    version = cache.get(version_key(name))
+    if version is None:
+        # first use or evicted: a fresh random token can never match an old memo
+        cache.add(version_key(name), uuid.uuid4().hex, None)
+        version = cache.get(version_key(name)) or uuid.uuid4().hex  # DummyCache: never memoize
+    return version
+
+
+def load(name):
+    version = current_version(name)
+    memo = _memo.get(name)
+    if memo is not None and memo[0] == version:
+        return memo[1]
+
+    rows = cache.get(data_key(name, version))
+    if rows is None:
+        rows = LOADERS[name]()
+        cache.set(data_key(name, version), rows, getattr(settings, 'REFERENCE_DATA_TIMEOUT', 3600))
+    with _memo_lock:
+        _memo[name] = (version, rows)
+    return rows
+
+
+def bump(name):
+    """Throw away every cached copy of `name` (all processes)."""
+    cache.set(version_key(name), uuid.uuid4().hex, None)
+
+
+def get_departments():
+    return load('departments')
+
+
+def get_courses():
+    return load('courses')
+
+
+def get_department(pk):
+    return next((dept for dept in get_departments() if str(dept.pk) == str(pk)), None)
+
+
+def get_course(pk):
+    return next((course for course in get_courses() if str(course.pk) == str(pk)), None)
@@ -0,0 +1,142 @@
+import contextvars
+import functools
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Read replicas for the heavy read-only pages (admin student list / export, course request queue).
+#
+# Reads only leave the primary inside a view decorated with @replica_reads, everything else
+# (auth, sessions, writes, select_for_update, anything inside transaction.atomic) stays on
+# `default`. A replica is skipped when it is unreachable or further behind than
+# REPLICA_MAX_LAG_SECONDS (checked at most every REPLICA_LAG_CHECK_SECONDS per process);
+# with no usable replica reads simply go to the primary.
+#
+# Read-your-writes: ReplicaPinMiddleware sets a short cookie after every POST and after any
+# request that wrote to the database (e.g. a GET that still writes). While it is present
+# that browser reads from the primary, so the redirect after approve / edit shows the change
+# even if the replica has not replayed it yet.
+#
+# Cached data (profile payloads, reference data) is always built from the primary, a
+# lagging replica would otherwise put stale rows in the cache for everyone.
+
+PIN_COOKIE = 'db_pin'
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+_request_writes = contextvars.ContextVar('request_writes', default=None)  # {'wrote': bool} per request
+
+_health = {}  # alias -> (checked_at, usable)
+_health_lock = threading.Lock()
+
+# seconds the replica is behind, 0 when it has replayed everything it received
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replica_aliases():
+    return [alias for alias in getattr(settings, 'REPLICA_DATABASES', ()) if alias in settings.DATABASES]
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+def measure_lag(alias):
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0  # sqlite copies in local tests have no replication to measure
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def is_usable(alias):
+    now = time.monotonic()
+    checked = _health.get(alias)
+    if checked and now - checked[0] < getattr(settings, 'REPLICA_LAG_CHECK_SECONDS', 5):
+        return checked[1]
+    with _health_lock:
+        try:
+            usable = measure_lag(alias) <= getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 2)
+        except DatabaseError:
+            usable = False  # down / unreachable: primary until the next check
+        _health[alias] = (now, usable)
+    return usable
+
+
+def reset_health():
+    _health.clear()
+
+
+class ReplicaRouter:
+    """DATABASE_ROUTERS entry: replicas for reads inside @replica_reads, primary for the rest."""
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        usable = [alias for alias in replica_aliases() if is_usable(alias)]
+        return random.choice(usable) if usable else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        writes = _request_writes.get()
+        if writes is not None:
+            writes['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # same data on every alias
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS  # replicas get their schema through replication
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def replica_reads(view):
+    """Let the view's read-only queries go to a replica (unless the browser is pinned to the primary)."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = _use_replica.set(request.method in ('GET', 'HEAD') and not is_pinned(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _use_replica.reset(token)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = _use_replica.set(request.method in ('GET', 'HEAD') and not is_pinned(request))
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _use_replica.reset(token)
+    return wrapper
+
+
+def track_writes():
+    """Start recording writes for the current request, returns (holder, token for reset)."""
+    writes = {'wrote': False}  # mutable, so writes made in sync_to_async threads are seen too
+    return writes, _request_writes.set(writes)
+
+
+def stop_tracking(token):
+    _request_writes.reset(token)
+
+
+def pin_to_primary(response):
+    seconds = pin_seconds()
+    response.set_cookie(PIN_COOKIE, str(int(time.time() + seconds)), max_age=seconds, httponly=True, samesite='Lax')
+    return response
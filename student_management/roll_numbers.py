@@ -0,0 +1,130 @@
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+
+# Roll number allocation for CustomUser.save.
+# The old way (max(roll_number) + 1) cost a query per insert and two workers could read the
+# same max, then one of them failed on the unique constraint.
+#
+# PostgreSQL: a real sequence (student_roll_number_seq, created in migration 0011).
+#   nextval() never hands out the same value twice, even if the caller rolls back,
+#   so each process can safely keep a block of numbers in memory.
+# Other databases (SQLite in dev): the RollNumberCounter row, locked with SELECT ... FOR UPDATE.
+#   A counter update is rolled back with the surrounding transaction, so there we only keep
+#   a block when we are not inside someone else's transaction.
+#
+# Numbers reserved by a process that exits are simply skipped (gaps are fine, duplicates are not).
+#
+# Admins can also type a roll number (FullCustomUserChangeForm). CustomUser.save then calls
+# reserve_roll_number() so the sequence / counter moves past it, and an allocated number that
+# turns out to be taken anyway (an older block in some process) is retried, see CustomUser.save.
+
+SEQUENCE_NAME = 'student_roll_number_seq'
+COUNTER_NAME = 'roll_number'
+FIRST_ROLL_NUMBER = 100
+
+
+def _claim_from_sequence(count):
+    # one round trip for any count
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(%s) FROM generate_series(1, %s)', [SEQUENCE_NAME, count]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _claim_from_counter(count):
+    from .models import RollNumberCounter
+
+    with transaction.atomic():
+        counter, _ = RollNumberCounter.objects.select_for_update().get_or_create(
+            name=COUNTER_NAME, defaults={'next_value': FIRST_ROLL_NUMBER},
+        )
+        start = counter.next_value
+        counter.next_value = start + count
+        counter.save(update_fields=['next_value'])
+    return list(range(start, start + count))
+
+
+def reserve_roll_number(value):
+    """A roll number was set by hand: never hand it (or anything below it) out again."""
+    from .models import RollNumberCounter
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            # GREATEST: a smaller manual number must not move the sequence back
+            cursor.execute(
+                f'SELECT setval(%s, GREATEST(%s, last_value)) FROM {SEQUENCE_NAME}', [SEQUENCE_NAME, value]
+            )
+        return
+    with transaction.atomic():
+        updated = RollNumberCounter.objects.filter(name=COUNTER_NAME).update(
+            next_value=Greatest(F('next_value'), value + 1),
+        )
+        if not updated:
+            RollNumberCounter.objects.get_or_create(
+                name=COUNTER_NAME, defaults={'next_value': max(FIRST_ROLL_NUMBER, value + 1)},
+            )
+
+
+def claim_roll_numbers(count):
+    """Take `count` fresh numbers straight from the database (no local block)."""
+    if count <= 0:
+        return []
+    if connection.vendor == 'postgresql':
+        return _claim_from_sequence(count)
+    return _claim_from_counter(count)
+
+
+class RollNumberAllocator:
+    """Per-process allocator that hands out numbers from a reserved block."""
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.block = []
+        self.pid = os.getpid()
+
+    def get_block_size(self):
+        return self.block_size or getattr(settings, 'ROLL_NUMBER_BLOCK_SIZE', 20)
+
+    def can_keep_block(self):
+        # a counter row claimed inside an outer transaction could be rolled back under us
+        return connection.vendor == 'postgresql' or not connection.in_atomic_block
+
+    def allocate(self, count=1):
+        """Return `count` unique roll numbers."""
+        with self.lock:
+            if self.pid != os.getpid():
+                self.reset()  # forked worker, never reuse the parent's block
+            if not self.can_keep_block():
+                return claim_roll_numbers(count)
+            if len(self.block) < count:
+                # big requests (bulk imports) get exactly what they need in one round trip
+                wanted = max(count - len(self.block), self.get_block_size())
+                self.block.extend(claim_roll_numbers(wanted))
+            numbers, self.block = self.block[:count], self.block[count:]
+            return numbers
+
+
+allocator = RollNumberAllocator()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=allocator.reset)
+
+
+def allocate_roll_number():
+    return allocator.allocate(1)[0]
+
+
+def allocate_roll_numbers(count):
+    """For bulk creation: claim `count` numbers at once."""
+    return allocator.allocate(count)
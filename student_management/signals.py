@@ -0,0 +1,81 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import AddOnCourse, CoursePurchaseRequest, CustomUser, Department
+from .auth_backends import invalidate_cached_user
+from .profile_cache import invalidate_profile
+from . import reference_data
+from .middleware import remember_role
+from .metrics import install_query_counter
+
+
+# per-user profile cache (profile_cache.py)
+
+@receiver([post_save, post_delete], sender=CoursePurchaseRequest)
+def purchase_request_changed(sender, instance, **kwargs):
+    invalidate_profile(instance.student_id)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    invalidate_profile(instance.pk)
+    invalidate_cached_user(instance.pk)  # cached request.user (auth_backends.py), incl. password changes
+
+
+@receiver(m2m_changed, sender=CustomUser.purchased_courses.through)
+def purchased_courses_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # course.students.clear(): remember who is affected before the rows are gone
+        instance._cleared_student_ids = list(instance.students.values_list('id', flat=True))
+        return
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_profile(instance.pk)
+    elif action == 'post_clear':
+        invalidate_profile(*getattr(instance, '_cleared_student_ids', []))
+    elif pk_set:
+        invalidate_profile(*pk_set)  # course.students.add(...) -> pk_set are user ids
+
+
+# reference data cache (reference_data.py): new version token once the change is committed,
+# bumping earlier would let another process cache the old rows under the new version
+
+@receiver(pre_delete, sender=Department)
+def department_deleting(sender, instance, **kwargs):
+    # on_delete=SET_NULL empties the members' department with an UPDATE (no signals)
+    instance._member_ids = list(CustomUser.objects.filter(department_id=instance.pk).values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Department)
+def department_changed(sender, instance, **kwargs):
+    member_ids = getattr(instance, '_member_ids', None)
+    if member_ids is None:
+        member_ids = list(CustomUser.objects.filter(department_id=instance.pk).values_list('id', flat=True))
+
+    def changed():
+        reference_data.bump('departments')
+        invalidate_cached_user(*member_ids)  # the cached request.user has its department joined
+
+    transaction.on_commit(changed)
+
+
+@receiver([post_save, post_delete], sender=AddOnCourse)
+def course_changed(sender, **kwargs):
+    transaction.on_commit(lambda: reference_data.bump('courses'))
+
+
+# role claim used by BlockAccessMiddleware, so it never has to load the user row
+@receiver(user_logged_in)
+def store_role_claim(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        remember_role(request.session, user)
+
+
+# per-request query counts of the metrics (metrics.py), on every connection from the start
+@receiver(connection_created)
+def count_queries(sender, connection, **kwargs):
+    install_query_counter(connection)
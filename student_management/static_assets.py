@@ -0,0 +1,139 @@
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # optional, `pip install brotli` adds .br next to .gz
+    brotli = None
+
+
+# Static files in production, served by the app itself (StaticFilesMiddleware, no CDN needed).
+#
+# `manage.py collectstatic` (CompressedManifestStaticFilesStorage) writes every file under a
+# content hashed name (style.4f2a9c1e.css, {% static %} links to it) and, for text files,
+# a gzip (.gz) and, with brotli installed, a brotli (.br) copy next to it.
+# The middleware answers /static/... from STATIC_ROOT with the smallest copy the browser
+# accepts. Hashed names never change content, so they are sent with a far future
+# `Cache-Control: immutable`: a repeat page load makes no static request at all. Other
+# files (no hash) get STATIC_MAX_AGE and If-Modified-Since.
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.xml', '.html', '.ico')
+MIN_COMPRESS_SIZE = 200  # bytes, smaller files barely shrink
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # preferred first
+
+
+def compressed_variants(content):
+    yield '.gz', gzip.compress(content, compresslevel=9, mtime=0)  # mtime=0: same bytes every run
+    if brotli is not None:
+        yield '.br', brotli.compress(content, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # a template naming a file that was never collected gets its plain url (a 404) instead
+    # of turning the whole page into a 500 (profile.html's default_profile.png)
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            if self.manifest_strict:
+                raise
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = {}
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names[name] = hashed_name
+            yield name, hashed_name, processed
+        if not dry_run:
+            for hashed_name in hashed_names.values():
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, data in compressed_variants(content):
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            if len(data) < len(content) * 0.95:  # not worth a Content-Encoding otherwise
+                self._save(name + suffix, ContentFile(data))
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        self.path = path
+        self.immutable = immutable
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.mtime = os.stat(path).st_mtime
+        self.variants = [(encoding, path + suffix) for encoding, suffix in ENCODINGS if os.path.isfile(path + suffix)]
+
+    def pick(self, accept_encoding):
+        """(path, Content-Encoding or None) of the smallest copy the client accepts."""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, path in self.variants:
+            if encoding in accepted:
+                return path, encoding
+        return self.path, None
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        encoding, _, params = part.partition(';')
+        name, _, value = params.strip().partition('=')
+        if name.strip() == 'q':
+            try:
+                if float(value) == 0:
+                    continue  # "gzip;q=0": explicitly refused
+            except ValueError:
+                pass
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+def build_index(root):
+    """{path under STATIC_URL: StaticFile} of everything collectstatic wrote to `root`."""
+    hashed = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+    index = {}
+    for directory, _, names in os.walk(root):
+        for filename in names:
+            path = os.path.join(directory, filename)
+            if filename.endswith(('.gz', '.br')) and os.path.isfile(path[:-3]):
+                continue  # compressed copy, found through its original
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            index[name] = StaticFile(path, immutable=name in hashed)
+    return index
+
+
+def serve(request, static_file):
+    if not static_file.immutable and not was_modified_since(
+            request.headers.get('If-Modified-Since'), static_file.mtime):
+        return HttpResponseNotModified()
+    path, encoding = static_file.pick(request.headers.get('Accept-Encoding', ''))
+    response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+    del response['Content-Disposition']  # FileResponse names the (.gz) file, browsers don't need it
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if static_file.variants:
+        response['Vary'] = 'Accept-Encoding'
+    response['Last-Modified'] = http_date(static_file.mtime)
+    if static_file.immutable:
+        max_age = getattr(settings, 'STATIC_IMMUTABLE_MAX_AGE', 365 * 24 * 3600)
+        response['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={getattr(settings, "STATIC_MAX_AGE", 60)}'
+    return response
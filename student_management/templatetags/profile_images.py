@@ -0,0 +1,11 @@
+from django import template
+
+from student_management.images import thumbnail_url
+
+register = template.Library()
+
+
+# {% profile_thumbnail student.profile_picture 100 %} -> url of the 100x100 thumbnail
+@register.simple_tag
+def profile_thumbnail(picture, size):
+    return thumbnail_url(picture, int(size))
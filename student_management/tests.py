@@ -1,3 +1,435 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.utils.http import http_date
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import models, reference_data
+from .images import is_processed, thumbnail_name, thumbnail_url
+from .auth_backends import CachedModelBackend
+from .forms import CustomUserCreationForm
+from .mail import deliver_batch, queue_mail
+from .middleware import ROLE_SESSION_KEY, BlockAccessMiddleware, ReplicaPinMiddleware
+from .models import AddOnCourse, CoursePurchaseRequest, CustomUser, Department, OutboundEmail
+from .replicas import PIN_COOKIE, ReplicaRouter, is_pinned, replica_reads
+from .static_assets import CompressedManifestStaticFilesStorage, StaticFile, serve
+
+
+LOCMEM_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+REGISTRATION = {
+    'username': 'newbie', 'email': 'newbie@example.com', 'password1': 'Xk29!aaqq', 'password2': 'Xk29!aaqq',
+    'phone': '9999999999', 'age': 20, 'place': 'x', 'gender': 'Male', 'date_of_birth': '2000-01-01',
+    'year_of_admission': 2024,
+}
+
+
+class StudentTestCase(TestCase):
+    def setUp(self):
+        cache.clear()  # profile / reference data / cached users live in the (locmem) cache
+        self.department = Department.objects.create(name='CS')
+        self.course = AddOnCourse.objects.create(course='Python', description='d', price=10)
+        self.student = CustomUser.objects.create_user(
+            username='student', email='student@example.com', password='pw', department=self.department,
+        )
+
+
+class PurchaseRequestTransitionTests(StudentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.purchase_request = CoursePurchaseRequest.objects.create(student=self.student, course=self.course)
+
+    def test_approve_twice(self):
+        self.assertTrue(self.purchase_request.approve())
+        self.assertFalse(CoursePurchaseRequest.objects.get(pk=self.purchase_request.pk).approve())
+        self.purchase_request.refresh_from_db()
+        self.assertEqual(self.purchase_request.status, 'approved')
+        self.assertTrue(self.student.purchased_courses.filter(pk=self.course.pk).exists())
+
+    def test_reject_after_complete_is_refused(self):
+        self.assertTrue(self.purchase_request.approve())
+        self.assertTrue(self.purchase_request.complete())
+        self.assertFalse(self.purchase_request.reject())
+        self.purchase_request.refresh_from_db()
+        self.assertEqual(self.purchase_request.status, 'completed')
+
+    def test_complete_needs_approval(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('mark_course_completed', args=[self.course.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.purchase_request.refresh_from_db()
+        self.assertEqual(self.purchase_request.status, 'pending')
+
+
+class RollNumberTests(StudentTestCase):
+    def test_manual_roll_number_is_not_handed_out_again(self):
+        manual = CustomUser.objects.create_user(username='manual', email='manual@example.com', password='pw')
+        manual.roll_number = self.student.roll_number + 1
+        manual.save()
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.assertNotIn(other.roll_number, (self.student.roll_number, manual.roll_number))
+
+    def test_resave_does_not_reserve_again(self):
+        with mock.patch('admin_panel.analytics.user_saved'):  # it sets _loaded_values too
+            user = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+            with mock.patch.object(models, 'reserve_roll_number') as reserve:
+                user.save()
+                user.save(update_fields=['place'])
+        reserve.assert_not_called()
+
+    def test_taken_roll_number_is_retried(self):
+        taken = self.student.roll_number
+        with mock.patch.object(models, 'allocate_roll_number', side_effect=[taken, taken + 1000]):
+            other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.assertEqual(other.roll_number, taken + 1000)
+
+    def test_roll_number_conflict_is_a_form_error(self):
+        with mock.patch.object(models, 'allocate_roll_number', return_value=self.student.roll_number):
+            response = self.client.post(reverse('register'), {**REGISTRATION, 'department': self.department.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.assertFalse(CustomUser.objects.filter(username='newbie').exists())
+
+
+class ProfileConditionalGetTests(StudentTestCase):
+    def test_matching_etag_gets_304(self):
+        self.client.force_login(self.student)
+        etag = self.client.get(reverse('profile'))['ETag']
+        response = self.client.get(reverse('profile'), headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_purchase_changes_etag(self):
+        self.client.force_login(self.student)
+        etag = self.client.get(reverse('profile'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('purchase_course', args=[self.course.pk]))
+        self.client.get(reverse('profile'))  # shows (and uses up) the flash message
+        response = self.client.get(reverse('profile'), headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ReferenceDataTests(StudentTestCase):
+    def test_warm_reads_make_no_queries(self):
+        reference_data.get_departments()
+        with self.assertNumQueries(0):
+            self.assertEqual([dept.name for dept in reference_data.get_departments()], ['CS'])
+            str(CustomUserCreationForm()['department'])
+
+    def test_saved_department_is_reloaded(self):
+        reference_data.get_departments()
+        version = reference_data.current_version('departments')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.department.name = 'Computer Science'
+            self.department.save()
+        self.assertNotEqual(reference_data.current_version('departments'), version)
+        self.assertEqual([dept.name for dept in reference_data.get_departments()], ['Computer Science'])
+
+    def test_bump_waits_for_commit(self):
+        version = reference_data.current_version('courses')
+        with self.captureOnCommitCallbacks() as callbacks:
+            AddOnCourse.objects.create(course='Django', description='d', price=20)
+            self.assertEqual(reference_data.current_version('courses'), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(reference_data.current_version('courses'), version)
+
+
+class BlockAccessTests(StudentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.middleware = BlockAccessMiddleware(lambda request: HttpResponse('ok'))
+
+    def request(self, path, session, user=None):
+        request = RequestFactory().get(path)
+        request.session = session
+        request.user = user if user is not None else mock.Mock(spec=[])  # raises if looked at
+        return request
+
+    def test_student_is_kept_off_admin_pages(self):
+        self.client.force_login(self.student)
+        self.assertRedirects(self.client.get('/adm/'), '/', fetch_redirect_response=False)
+
+    def test_admin_is_kept_on_admin_pages(self):
+        self.client.force_login(CustomUser.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.assertRedirects(self.client.get(reverse('profile')), '/adm/', fetch_redirect_response=False)
+
+    def test_assets_and_open_paths_skip_the_session(self):
+        for path in ('/' + settings.STATIC_URL.lstrip('/') + 'style.css', '/', '/logout/'):
+            with self.assertNumQueries(0):
+                response = self.middleware(self.request(path, session=mock.Mock(spec=[])))
+            self.assertEqual(response.content, b'ok')
+
+    def test_fresh_claim_skips_the_user_row(self):
+        pk = str(self.student.pk)
+        session = {SESSION_KEY: pk, ROLE_SESSION_KEY: ['student', pk, int(time.time())]}
+        with self.assertNumQueries(0):
+            response = self.middleware(self.request('/adm/', session))
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+
+    def test_stale_claim_is_checked_against_the_user(self):
+        pk = str(self.student.pk)
+        stale = int(time.time()) - getattr(settings, 'ROLE_CLAIM_MAX_AGE', 300) - 1
+        session = {SESSION_KEY: pk, ROLE_SESSION_KEY: ['admin', pk, stale]}  # e.g. demoted since
+        response = self.middleware(self.request('/adm/', session, user=self.student))
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertEqual(session[ROLE_SESSION_KEY][0], 'student')
+
+
+class CachedUserTests(StudentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = CachedModelBackend()
+        self.backend.get_user(self.student.pk)
+
+    def test_warm_user_makes_no_queries(self):
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.student.pk)
+            self.assertEqual(user.department.name, 'CS')
+
+    def test_password_change_drops_the_cached_user(self):
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+        student = CustomUser.objects.get(pk=self.student.pk)
+        student.set_password('changed')
+        student.save()
+        self.assertEqual(self.backend.get_user(self.student.pk).password, student.password)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 302)  # session hash no longer matches
+
+    def test_department_rename_drops_the_members(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.department.name = 'Computer Science'
+            self.department.save()
+        self.assertEqual(self.backend.get_user(self.student.pk).department.name, 'Computer Science')
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        # one (healthy) replica configured, without a second database in the test run
+        self.patch('student_management.replicas.replica_aliases', ['replica_1'])
+        self.patch('student_management.middleware.replica_aliases', ['replica_1'])
+        self.patch('student_management.replicas.is_usable', True)
+        self.router = ReplicaRouter()
+
+    def patch(self, target, return_value):
+        patcher = mock.patch(target, return_value=return_value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_alias(self, request):
+        @replica_reads
+        def view(request):
+            return self.router.db_for_read(CustomUser)
+        return view(request)
+
+    def test_reads_go_to_the_replica_only_inside_replica_reads(self):
+        self.assertEqual(self.read_alias(RequestFactory().get('/adm/')), 'replica_1')
+        self.assertEqual(self.router.db_for_read(CustomUser), 'default')
+        self.assertEqual(self.read_alias(RequestFactory().post('/adm/')), 'default')
+
+    def test_unusable_replica_falls_back_to_the_primary(self):
+        with mock.patch('student_management.replicas.is_usable', return_value=False):
+            self.assertEqual(self.read_alias(RequestFactory().get('/adm/')), 'default')
+
+    def pin_cookie(self, request, writes=False):
+        def view(request):
+            if writes:
+                self.router.db_for_write(CustomUser)
+            return HttpResponse()
+        return ReplicaPinMiddleware(view)(request).cookies.get(PIN_COOKIE)
+
+    def test_write_pins_the_browser_to_the_primary(self):
+        self.assertIsNone(self.pin_cookie(RequestFactory().get('/adm/')))
+        self.assertIsNotNone(self.pin_cookie(RequestFactory().post('/adm/')))
+        cookie = self.pin_cookie(RequestFactory().get('/adm/'), writes=True)
+        self.assertIsNotNone(cookie)
+
+        pinned = RequestFactory().get('/adm/')
+        pinned.COOKIES[PIN_COOKIE] = cookie.value
+        self.assertTrue(is_pinned(pinned))
+        self.assertEqual(self.read_alias(pinned), 'default')
+
+    def test_middleware_is_off_without_replicas(self):
+        with mock.patch('student_management.middleware.replica_aliases', return_value=[]):
+            self.assertIsNone(self.pin_cookie(RequestFactory().post('/adm/')))
+
+
+class TempMediaMixin:
+    def use_temp_media_root(self):
+        """Uploads and thumbnails go to a temp dir, never to the real MEDIA_ROOT."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        return media_root
+
+
+def image_bytes(fmt='JPEG', color='red', size=(300, 200)):
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, fmt)
+    return out.getvalue()
+
+
+class ProfilePictureTests(TempMediaMixin, StudentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_temp_media_root()
+
+    def test_upload_is_processed_with_thumbnails(self):
+        self.student.profile_picture = SimpleUploadedFile('me.png', image_bytes('PNG'), 'image/png')
+        self.student.save()
+        name = self.student.profile_picture.name
+        self.assertTrue(is_processed(name))
+        for size in (100, 150):
+            self.assertTrue(default_storage.exists(thumbnail_name(name, size)))
+        self.assertEqual(thumbnail_url(self.student.profile_picture, 100), default_storage.url(thumbnail_name(name, 100)))
+
+    def test_legacy_picture_shows_the_original_without_touching_the_disk(self):
+        CustomUser.objects.filter(pk=self.student.pk).update(profile_picture='profile_pics/old.jpg')
+        picture = CustomUser.objects.get(pk=self.student.pk).profile_picture
+        with mock.patch.object(default_storage, 'exists') as exists, mock.patch.object(default_storage, 'open') as open_:
+            self.assertEqual(thumbnail_url(picture, 100), picture.url)
+        exists.assert_not_called()
+        open_.assert_not_called()
+
+    def test_same_stem_different_extension_get_their_own_thumbnails(self):
+        self.assertNotEqual(thumbnail_name('profile_pics/x.jpg', 100), thumbnail_name('profile_pics/x.png', 100))
+
+    def test_command_converts_legacy_pictures_and_fills_in_thumbnails(self):
+        default_storage.save('profile_pics/old.jpg', io.BytesIO(image_bytes()))
+        CustomUser.objects.filter(pk=self.student.pk).update(profile_picture='profile_pics/old.jpg')
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        other.profile_picture = SimpleUploadedFile('other.jpg', image_bytes(color='blue'), 'image/jpeg')
+        other.save()
+        default_storage.delete(thumbnail_name(other.profile_picture.name, 150))  # e.g. a size added later
+
+        call_command('process_profile_pictures', stdout=io.StringIO())
+        converted = CustomUser.objects.get(pk=self.student.pk).profile_picture.name
+        self.assertTrue(is_processed(converted))
+        for name in (converted, other.profile_picture.name):
+            for size in (100, 150):
+                self.assertTrue(default_storage.exists(thumbnail_name(name, size)))
+
+    def test_is_processed_without_a_name(self):
+        self.assertFalse(is_processed(None))
+        self.assertFalse(is_processed(''))
+
+
+class MediaAccessTests(TempMediaMixin, StudentTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = self.use_temp_media_root()
+
+        self.picture = 'profile_pics/' + 'a' * 64 + '.jpg'
+        os.makedirs(os.path.join(media_root, 'profile_pics'))
+        with open(os.path.join(media_root, self.picture), 'wb') as picture:
+            picture.write(b'picture')
+        CustomUser.objects.filter(pk=self.student.pk).update(profile_picture=self.picture)
+        self.url = '/media/' + self.picture
+
+    def test_owner_sees_picture(self):
+        self.client.force_login(CustomUser.objects.get(pk=self.student.pk))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'picture')
+
+    def test_owner_sees_thumbnail(self):
+        thumbnail = thumbnail_name(self.picture, 100)
+        default_storage.save(thumbnail, io.BytesIO(b'thumb'))
+        self.client.force_login(CustomUser.objects.get(pk=self.student.pk))
+        self.assertEqual(self.client.get('/media/' + thumbnail).status_code, 200)
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get('/media/' + thumbnail).status_code, 404)
+
+    def test_anonymous_gets_404(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_other_student_gets_404(self):
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class StaticAssetTests(SimpleTestCase):
+    CSS = b'body { color: black; }\n' * 50
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.storage = CompressedManifestStaticFilesStorage(location=root, base_url='/static/')
+        self.storage.save('style.4f2a9c1e.css', io.BytesIO(self.CSS))
+        self.storage.save('tiny.css', io.BytesIO(b'a{}'))
+        self.storage.compress('style.4f2a9c1e.css')
+        self.storage.compress('tiny.css')
+
+    def body(self, response):
+        try:
+            return b''.join(response.streaming_content)
+        finally:
+            response.close()
+
+    def test_compress_writes_a_gzip_copy_of_text_files(self):
+        with self.storage.open('style.4f2a9c1e.css.gz') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), self.CSS)
+        self.assertFalse(self.storage.exists('tiny.css.gz'))  # too small to be worth it
+
+    def test_hashed_file_is_immutable_and_compressed(self):
+        static_file = StaticFile(self.storage.path('style.4f2a9c1e.css'), immutable=True)
+        response = serve(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, deflate'), static_file)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual((response['Content-Encoding'], response['Vary']), ('gzip', 'Accept-Encoding'))
+        self.assertEqual(gzip.decompress(self.body(response)), self.CSS)
+
+        response = serve(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip;q=0'), static_file)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(self.body(response), self.CSS)
+
+    @override_settings(STATIC_MAX_AGE=60)
+    def test_unhashed_file_is_revalidated(self):
+        static_file = StaticFile(self.storage.path('tiny.css'), immutable=False)
+        response = serve(RequestFactory().get('/'), static_file)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.body(response)
+        response = serve(RequestFactory().get('/', HTTP_IF_MODIFIED_SINCE=http_date(static_file.mtime)), static_file)
+        self.assertEqual(response.status_code, 304)
+
+
+class OutboxTests(TestCase):
+    def test_deliver_batch_drains_the_outbox(self):
+        email = queue_mail('Hello', 'Body', 'college@example.com', ['student@example.com'])
+        self.assertEqual(deliver_batch(backend=LOCMEM_BACKEND), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['student@example.com'])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+        self.assertEqual(deliver_batch(backend=LOCMEM_BACKEND), (0, 0))  # nothing sent twice
+
+    def test_leased_email_waits_for_its_lease(self):
+        email = queue_mail('Hello', 'Body', 'college@example.com', ['student@example.com'])
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            status='sending', next_attempt_at=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(deliver_batch(backend=LOCMEM_BACKEND), (0, 0))
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())  # worker died
+        self.assertEqual(deliver_batch(backend=LOCMEM_BACKEND), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
 from django.contrib.auth import views as auth_views
+from .forms import OutboxPasswordResetForm
 
 urlpatterns = [
     path('', views.home_view, name='home'),
@@ -14,7 +15,8 @@ urlpatterns = [
     
      # Forgot Password / Reset Password URLs
     path('password-reset/',
-         auth_views.PasswordResetView.as_view(template_name='password_reset.html'),
+         auth_views.PasswordResetView.as_view(template_name='password_reset.html',
+                                              form_class=OutboxPasswordResetForm),
          name='password_reset'),
 
     path('password-reset/done/',
@@ -3,11 +3,18 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .forms import CustomUserCreationForm, CustomAuthenticationForm,CustomUserChangeForm
-from django.core.mail import send_mail
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .mail import queue_mail
 from django.conf import settings
 from student_management.models import AddOnCourse
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 from .models import CoursePurchaseRequest
+from .conditional import conditional_page
+from .media import serve_media
+from .profile_cache import get_profile_payload, profile_version
+from .reference_data import current_version, get_course, get_courses
 from django.utils import timezone
 # Home View
 
@@ -19,17 +26,20 @@ def home_view(request):
 def register_view(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST, request.FILES) # Include request.FILES to get profile picture
-        if form.is_valid():
-            student = form.save()
-            #email sending
-            subject = "Welcome to ABC College"
-            message = f"Hi {student.username},\n\nWelcome! Your account has been successfully created."
-            recipient = student.email
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [recipient])
-            messages.success(request, 'Registration successful! You can now log in.')
-            return redirect('login') 
-        else:
-            messages.error(request, 'Please correct the errors below.')
+        try:
+            if form.is_valid():
+                with transaction.atomic():
+                    student = form.save()  # a name taken meanwhile raises ValidationError, see UniqueFieldsMixin
+                    #email goes to the outbox in the same transaction, sent by `manage.py send_outbox`
+                    subject = "Welcome to ABC College"
+                    message = f"Hi {student.username},\n\nWelcome! Your account has been successfully created."
+                    recipient = student.email
+                    queue_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [recipient])
+                messages.success(request, 'Registration successful! You can now log in.')
+                return redirect('login') 
+        except ValidationError:
+            pass  # the field error is on the form now
+        messages.error(request, 'Please correct the errors below.')
     else:
         form = CustomUserCreationForm()
     return render(request, 'register.html', {'form': form})
@@ -65,21 +75,21 @@ def logout_view(request):
 
 # Profile View
 
+# everything profile.html shows, as cache version tokens: no query (see conditional.py)
+def profile_stamps(request):
+    return [profile_version(request.user.pk), current_version('courses'), current_version('departments')]
+
+
 @login_required()
+@conditional_page(profile_stamps)
 def profile_view(request):
     user = request.user #Where request.user comes from Django attaches the user attribute to every HttpRequest object via middleware.
-    courses = AddOnCourse.objects.all()
-    pending_requests = CoursePurchaseRequest.objects.filter(student=user, status='pending')
-    approved_requests = CoursePurchaseRequest.objects.filter(student=user, status='approved')
-    completed_requests = CoursePurchaseRequest.objects.filter(student=user, status='completed')
-    rejected_requests = CoursePurchaseRequest.objects.filter(student=user, status='rejected')
+    courses = get_courses()  # cached reference data, see reference_data.py
+    # requests (with their course) + purchased ids come from one cached payload, see profile_cache.py
     context = {
         'user': user,
         'courses': courses,
-        'pending_requests': pending_requests,
-        'approved_requests': approved_requests,
-        'completed_requests': completed_requests,
-        'rejected_requests': rejected_requests,
+        **get_profile_payload(user),
     }
     if not user.is_authenticated:
         messages.error(request, 'You must login to view your profile.')
@@ -92,12 +102,14 @@ def profile_view(request):
 def edit_profile(request):
     if request.method == 'POST':
         form = CustomUserChangeForm(request.POST, instance=request.user) 
-        if form.is_valid():
-            form.save()
-            messages.success(request, 'Profile updated successfully!')
-            return redirect('profile')
-        else:
-            messages.error(request, 'Please correct the errors below.')
+        try:
+            if form.is_valid():
+                form.save()
+                messages.success(request, 'Profile updated successfully!')
+                return redirect('profile')
+        except ValidationError:
+            pass  # username / email taken meanwhile, the error is on the form
+        messages.error(request, 'Please correct the errors below.')
     else:
         form = CustomUserChangeForm(instance=request.user) 
 
@@ -123,18 +135,15 @@ def purchase_course(request, course_id):
 
 @login_required
 def mark_course_completed(request, course_id):
-    purchase_request = get_object_or_404(
-        CoursePurchaseRequest,
-        student=request.user,
-        course_id=course_id,
-        status='approved'  # Only "In Progress" courses can be marked completed
+    # one conditional UPDATE, only "In Progress" courses can be marked completed (no row loaded)
+    completed = CoursePurchaseRequest.objects.filter(student=request.user, course_id=course_id).transition(
+        'approved', 'completed', completed_at=timezone.now(),
     )
+    if not completed:
+        raise Http404('No course in progress to mark as completed.')
 
-    purchase_request.status = 'completed'
-    purchase_request.completed_at = timezone.now()
-    purchase_request.save()
-
-    messages.success(request, f'Course "{purchase_request.course.course}" marked as completed.')
+    course = get_course(course_id)  # cached reference data, no query
+    messages.success(request, f'Course "{course.course if course else course_id}" marked as completed.')
     return redirect('profile')
 
 # form.isvalid() do this
@@ -166,4 +175,9 @@ def mark_course_completed(request, course_id):
 
 # form.is_valid() returns False.
 
-# Errors are added to form.errors → can be displayed in the template.
\ No newline at end of file
+# Errors are added to form.errors → can be displayed in the template.
+
+
+# uploaded files, access checked here, bytes sent by nginx / apache when set up (media.py)
+def media_view(request, path):
+    return serve_media(request, path)